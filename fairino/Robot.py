@@ -1,4 +1,5 @@
 import xmlrpc.client
+import http.client
 import os
 import socket
 import hashlib
@@ -201,6 +202,66 @@ def xmlrpc_timeout(func):
     return wrapper
 
 
+class KeepAliveTransport(xmlrpc.client.Transport):
+    """
+    XML-RPC 长连接传输层，用于 ServoJ/MoveJ 等高频指令
+
+    - 每个线程一条 HTTP/1.1 keep-alive 连接（默认 Transport 只有一条共享连接，
+      多线程同时调用会互相打断，导致反复重建 TCP 连接）
+    - 连接建立后设置 TCP_NODELAY，并可设置独立的超时时间
+    - 不请求 gzip，应答按 Content-Length 一次读完再解析
+    - 复用的空闲连接失效时自动重连并重发一次
+    """
+
+    accept_gzip_encoding = False
+
+    def __init__(self, timeout=None, use_datetime=False, use_builtin_types=False):
+        super().__init__(use_datetime=use_datetime, use_builtin_types=use_builtin_types)
+        self.timeout = timeout  # None 表示沿用 socket 默认超时
+        self._local = threading.local()
+
+    def make_connection(self, host):
+        conn = getattr(self._local, "conn", None)
+        if conn is not None and self._local.host == host:
+            self._local.reused = True
+            return conn
+        chost, self._extra_headers, x509 = self.get_host_info(host)
+        if self.timeout is None:
+            conn = http.client.HTTPConnection(chost)
+        else:
+            conn = http.client.HTTPConnection(chost, timeout=self.timeout)
+        conn.connect()
+        conn.sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        self._local.host = host
+        self._local.conn = conn
+        self._local.reused = False
+        return conn
+
+    def close(self):
+        """关闭当前线程的连接"""
+        conn = getattr(self._local, "conn", None)
+        if conn is not None:
+            self._local.conn = None
+            self._local.host = None
+            conn.close()
+
+    def request(self, host, handler, request_body, verbose=False):
+        for attempt in (0, 1):
+            try:
+                return self.single_request(host, handler, request_body, verbose)
+            except (http.client.RemoteDisconnected, ConnectionError):
+                # 只有复用的空闲连接才重发：新连接上失败说明控制器确实不可达
+                if attempt or not getattr(self._local, "reused", False):
+                    raise
+
+    def parse_response(self, response):
+        body = response.read()
+        p, u = self.getparser()
+        p.feed(body)
+        p.close()
+        return u.close()
+
+
 class RobotError:
     ERR_SUCCESS = 0
     ERR_POINTTABLE_NOTFOUND = -7  # 上传文件不存在
@@ -228,6 +289,8 @@ class RPC():
 
     logger = None
     log_output_model = -1
+    log_sampling = {}  # 函数名 -> 采样间隔，见 set_log_sampling
+    _log_counts = {}
     queue = Queue(maxsize=10000 * 1024)
     logging_thread = None
     is_conect = True
@@ -242,31 +305,50 @@ class RPC():
     reconnect_lock = False
     reconnect_flag = False
     g_sock_com_err = RobotError.ERROR_RECONN
+    state_checksum_errors = 0  # 20004 状态包校验失败次数
+    _state_listeners = ()
 
 
-    def __init__(self, ip="192.168.58.2"):
+    def __init__(self, ip="192.168.58.2", keepalive=False, lazy=False):
         self.lock = threading.Lock()  # 增加锁
         self.ip_address = ip
+        self.keepalive = keepalive  # True: 使用 KeepAliveTransport 长连接发送指令
         link = 'http://' + self.ip_address + ":20003"
-        self.robot = xmlrpc.client.ServerProxy(link)#xmlrpc连接机器人20003端口，用于发送机器人指令数据帧
+        self._link = link
+        self.robot = self._make_proxy(link)#xmlrpc连接机器人20003端口，用于发送机器人指令数据帧
 
         self.sock_cli_state = None
         self.robot_realstate_exit = False
         self.robot_state_pkg = RobotStatePkg#机器人状态数据
 
         self.stop_event = threading.Event()  # 停止事件
+        self._state_listeners = ()  # 状态回调，见 add_state_listener
+        self.state_received = threading.Event()  # 收到第一个有效状态包后置位
+        self.ready = threading.Event()  # 连接流程（实时端口 + XML-RPC 探测）完成后置位，见 wait_ready
+
+        if lazy:
+            # 后台连接，构造函数立即返回
+            connect_thread = threading.Thread(target=self._connect, args=(link,))
+            connect_thread.daemon = True
+            connect_thread.start()
+        else:
+            self._connect(link)
+
+    def _connect(self, link):
+        """连接实时端口、启动状态线程并探测 XML-RPC 端口"""
         self.connect_to_robot()
         thread= threading.Thread(target=self.robot_state_routine_thread)#创建线程循环接收机器人状态数据
         thread.daemon = True
         thread.start()
-        time.sleep(1)
+        # 等待第一个状态包，最多 1 秒
+        self.state_received.wait(1)
         print(self.robot)
 
-
         try:
-            # 调用 XML-RPC 方法
-            socket.setdefaulttimeout(1)
-            self.robot.GetControllerIP()
+            # 调用 XML-RPC 方法；超时只设置在探测连接的 socket 上，不修改进程全局默认超时
+            probe = xmlrpc.client.ServerProxy(link, transport=KeepAliveTransport(timeout=1))
+            probe.GetControllerIP()
+            probe("close")()
         except socket.timeout:
             print("XML-RPC connection timed out.")
             RPC.is_conect = False
@@ -278,10 +360,38 @@ class RPC():
             print("An error occurred during XML-RPC call:", e)
             RPC.is_conect = False
         finally:
-            # 恢复默认超时时间
-            self.robot = None
-            socket.setdefaulttimeout(None)
-            self.robot = xmlrpc.client.ServerProxy(link)
+            self.ready.set()
+
+    def wait_ready(self, timeout=None):
+        """
+        等待连接流程完成（lazy 模式下构造函数不等待）
+        @return True-已连接，False-超时或连接失败
+        """
+        return self.ready.wait(timeout) and RPC.is_conect
+
+    def _make_proxy(self, link):
+        """创建 XML-RPC 代理，keepalive 时使用长连接传输层"""
+        if self.keepalive:
+            return xmlrpc.client.ServerProxy(link, transport=KeepAliveTransport())
+        return xmlrpc.client.ServerProxy(link)
+
+    def command_proxy(self, timeout):
+        """
+        创建带超时的独立 XML-RPC 代理（停止、暂停等安全指令专用）
+        直接调用控制器方法，不经过 SDK 的无限重试；超时抛出 socket.timeout，由调用方决定是否重试
+        """
+        return xmlrpc.client.ServerProxy(self._link, transport=KeepAliveTransport(timeout=timeout))
+
+    def add_state_listener(self, callback):
+        """
+        注册状态回调：每收到一个校验通过的 20004 状态包，在接收线程中调用 callback(pkg)
+        pkg 与 self.robot_state_pkg 是同一个对象，每包新建，回调中不要修改它
+        """
+        self._state_listeners = self._state_listeners + (callback,)
+
+    def remove_state_listener(self, callback):
+        """注销状态回调"""
+        self._state_listeners = tuple(cb for cb in self._state_listeners if cb is not callback)
 
     def connect_to_robot(self):
         """连接到机器人的实时端口"""
@@ -467,101 +577,89 @@ class RPC():
     def robot_state_routine_thread(self):
         """处理机器人状态数据包的线程例程"""
 
+        # 缓冲区只分配一次；包头用 bytes.find 定位，数据按切片拷贝，校验和在 memoryview 上求和
+        recvbuf = bytearray(self.BUFFER_SIZE)
+        view = memoryview(recvbuf)
+        pkg_size = sizeof(RobotStatePkg)
+        state_pkg = bytearray(pkg_size)
+
         while not self.closeRPC_state:
-            recvbuf = bytearray(self.BUFFER_SIZE)
-            tmp_recvbuf = bytearray(self.BUFFER_SIZE)
-            state_pkg = bytearray(self.BUFFER_SIZE)
-            find_head_flag = False
-            index = 0
-            length = 0
-            tmp_len = 0
-            expected_length = self.BUFFER_SIZE  # 初始期望接收长度
+            start = 0  # 未处理数据 recvbuf[start:end]
+            end = 0
 
             try:
                 while not self.robot_realstate_exit and not self.stop_event.is_set():
-                    recvbyte = self.sock_cli_state.recv_into(recvbuf)
-                    # print(f"接收机器人状态字节 {recvbyte}")
-                    # print("Python 结构体大小:", sizeof(self.robot_state_pkg))
+                    # 剩余空间不足时，把未处理数据移到缓冲区开头
+                    if start == end:
+                        start = end = 0
+                    elif self.BUFFER_SIZE - end < pkg_size:
+                        recvbuf[:end - start] = recvbuf[start:end]
+                        end -= start
+                        start = 0
+                        if end == self.BUFFER_SIZE:
+                            # 缓冲区被一个放不下的包占满，丢弃重新同步
+                            start = end = 0
+
+                    recvbyte = self.sock_cli_state.recv_into(view[end:])
                     if recvbyte <= 0:
                         self.sock_cli_state.close()
                         print("接收机器人状态字节 -1")
                         if not self.reconnect():
                             return
+                        start = end = 0
                         continue
+                    end += recvbyte
+
+                    while True:
+                        # 查找包头 0x5A5A
+                        head = recvbuf.find(b"\x5a\x5a", start, end)
+                        if head < 0:
+                            # 末尾单个 0x5A 可能是下一个包头的前半部分
+                            start = end - 1 if end > start and recvbuf[end - 1] == 0x5A else end
+                            break
+                        if head + 5 > end:
+                            start = head
+                            break
 
-                    # 处理临时缓冲区数据
-                    if tmp_len > 0:
-                        if tmp_len + recvbyte <= self.BUFFER_SIZE:
-                            recvbuf[:tmp_len + recvbyte] = tmp_recvbuf[:tmp_len] + recvbuf[:recvbyte]
-                            recvbyte += tmp_len
-                            tmp_len = 0
-                        else:
-                            tmp_len = 0
-
-                    i = 0
-                    while i < recvbyte:
-                        # 查找包头
-                        if format(recvbuf[i], '02X') == "5A" and not find_head_flag:
-                            if i + 4 < recvbyte and format(recvbuf[i + 1], '02X') == "5A":
-                                find_head_flag = True
-                                state_pkg[0] = recvbuf[i]
-                                index = 1
-                                length = (recvbuf[i + 4] << 8) | recvbuf[i + 3]
-
-                                #检查长度是否超过预期
-                                if length + 7 > expected_length:
-                                    expected_length = length + 7
-                                    # 需要接收更多数据
-                                    tmp_recvbuf[:recvbyte - i] = recvbuf[i:recvbyte]
-                                    tmp_len = recvbyte - i
-                                    find_head_flag = False
-                                    break
-
-                                i += 1
-                            else:
-                                i += 1
-                                continue
-
-                        # 已找到包头，收集数据
-                        elif find_head_flag and index < length + 5:
-                            if i >= recvbyte:
-                                break
-
-                            state_pkg[index] = recvbuf[i]
-                            index += 1
-                            i += 1
+                        length = recvbuf[head + 3] | (recvbuf[head + 4] << 8)
+                        total = length + 7
+                        if total > self.BUFFER_SIZE:
+                            # 长度不可能，跳过这个假包头
+                            start = head + 2
+                            continue
+                        if head + total > end:
+                            # 数据不足，等待下一次接收
+                            start = head
+                            break
 
                         # 检查校验和
-                        elif find_head_flag and index >= length + 5:
-                            if i + 1 < recvbyte:
-                                checksum = sum(state_pkg[:index])
-                                checkdata = (recvbuf[i + 1] << 8) | recvbuf[i]
-
-                                if checksum == checkdata:
-                                    self.robot_state_pkg = RobotStatePkg.from_buffer_copy(state_pkg[:sizeof(self.robot_state_pkg)])
-
-                                    # print(f"@@@@@@{self.robot_state_pkg.toolCoord[0]}")
-                                    find_head_flag = False
-                                    index = 0
-                                    length = 0
-                                    expected_length = self.BUFFER_SIZE  # 重置期望长度
-                                    i += 2
-                                else:
-                                    # 校验失败处理
-                                    self.robot_state_pkg.jt_cur_pos[0] = 0
-                                    self.robot_state_pkg.jt_cur_pos[1] = 0
-                                    self.robot_state_pkg.jt_cur_pos[2] = 0
-                                    find_head_flag = False
-                                    index = 0
-                                    length = 0
-                                    i += 2
-                            else:
-                                # 数据不足，保存到临时缓冲区
-                                tmp_recvbuf[:recvbyte - i] = recvbuf[i:recvbyte]
-                                tmp_len = recvbyte - i
-                                break
+                        data_end = head + length + 5
+                        checksum = sum(view[head:data_end])
+                        checkdata = recvbuf[data_end] | (recvbuf[data_end + 1] << 8)
+                        if checksum == checkdata:
+                            n = total if total < pkg_size else pkg_size
+                            state_pkg[:n] = view[head:head + n]
+                            pkg = RobotStatePkg.from_buffer_copy(state_pkg)
+                            self.robot_state_pkg = pkg
+                            if not self.state_received.is_set():
+                                self.state_received.set()
+                            for callback in self._state_listeners:
+                                try:
+                                    callback(pkg)
+                                except Exception as ex:
+                                    print("状态回调异常", ex)
+                            start = head + total
                         else:
-                            i += 1
+                            # 校验失败处理；从假包头后一个字节重新查找，避免丢掉紧随其后的真包
+                            self.state_checksum_errors += 1
+                            # 不修改已交给回调的状态包，换成一份前三轴清零的副本
+                            pkg = self.robot_state_pkg
+                            pkg = RobotStatePkg.from_buffer_copy(pkg) if isinstance(pkg, RobotStatePkg) else RobotStatePkg()
+                            pkg.jt_cur_pos[0] = 0
+                            pkg.jt_cur_pos[1] = 0
+                            pkg.jt_cur_pos[2] = 0
+                            self.robot_state_pkg = pkg
+                            start = head + 1
 
             except Exception as ex:
                 if not self.closeRPC_state:
@@ -780,32 +878,62 @@ class RPC():
 
     def log_call(func):
         """记录函数调用的日志操作"""
+        name = func.__name__
+
         @wraps(func)
         def wrapper(self, *args, **kwargs):
-            args_str = ', '.join(map(repr, args))
-            kwargs_str = ', '.join([f"{key}={value}" for key, value in kwargs.items()])
-            if (kwargs_str) == "":
-                call_message = f"Calling {func.__name__}" + f"({args_str}" + ")."
+            logger = self.logger
+            # 快速路径：未配置日志或日志等级不会输出任何内容时，不做任何字符串格式化
+            if logger is None or not logger.isEnabledFor(logging.ERROR):
+                return func(self, *args, **kwargs)
+
+            # 采样模式：高频伺服指令每 N 次记录一次调用和成功返回，错误始终记录
+            every = self.log_sampling.get(name)
+            if every:
+                count = self._log_counts.get(name, 0) + 1
+                self._log_counts[name] = count
+                sampled = count % every == 1
             else:
-                call_message = f"Calling {func.__name__}" + f"({args_str}" + "," + f"{kwargs_str})."
+                sampled = True
+
+            if sampled and logger.isEnabledFor(logging.INFO):
+                args_str = ', '.join(map(repr, args))
+                kwargs_str = ', '.join([f"{key}={value}" for key, value in kwargs.items()])
+                if (kwargs_str) == "":
+                    call_message = f"Calling {name}" + f"({args_str}" + ")."
+                else:
+                    call_message = f"Calling {name}" + f"({args_str}" + "," + f"{kwargs_str})."
+                logger.info(call_message)
 
-            self.log_info(call_message)
             result = func(self, *args, **kwargs)
             if isinstance(result, (list, tuple)) and len(result) > 0:
-                if result[0] == 0:
-                    self.log_debug(f"{func.__name__} returned: {result}.")
-                else:
-                    self.log_error(f"{func.__name__} Error occurred. returned: {result}")
+                ok = result[0] == 0
             else:
-                if result == 0:
-                    self.log_debug(f"{func.__name__} returned: {result}.")
-                else:
-                    self.log_error(f"{func.__name__} Error occurred. returned: {result}")
+                ok = result == 0
+            if not ok:
+                logger.error(f"{name} Error occurred. returned: {result}")
+            elif sampled and logger.isEnabledFor(logging.DEBUG):
+                logger.debug(f"{name} returned: {result}.")
 
             return result
 
         return wrapper
 
+    def set_log_sampling(self, every=10, names=("ServoJ", "ServoCart", "ServoJT")):
+        """
+        设置高频指令的日志采样
+        every: 每 every 次调用记录一次调用/返回日志，错误始终记录；0 或 None 关闭采样
+        names: 参与采样的函数名
+        """
+        self.log_sampling = dict(self.log_sampling)
+        for name in names:
+            if every and every > 1:
+                self.log_sampling[name] = int(every)
+            else:
+                self.log_sampling.pop(name, None)
+        self._log_counts = {}
+        return 0
+
     def log_debug(self, message):
         """用于记录debug等级日志"""
         if self.logger:
@@ -826,10 +954,11 @@ class RPC():
         if self.logger:
             self.logger.error(message)
 
-    def send_message(self, message):
-        """创建tcp连接发送消息"""
+    def send_message(self, message, timeout=None):
+        """创建tcp连接发送消息，timeout 为连接和等待应答的超时时间（None 不超时）"""
         # 创建一个TCP/IP套接字
         sock1 = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        sock1.settimeout(timeout)
         port = 8080  # 固定端口号为8080
         try:
             # 连接到服务器
@@ -1956,16 +2085,17 @@ class RPC():
 
     """   
     @brief  暂停运动
-    @param  [in] NULL
+    @param  [in] 默认参数 timeout: 发送超时时间，单位 [s]，默认 None 不超时
     @return 错误码 成功-0  失败-错误码
     """
 
     @log_call
     @xmlrpc_timeout
-    def PauseMotion(self):
+    def PauseMotion(self, timeout=None):
         # error = self.robot.PauseMotion()
-        self.send_message("/f/bIII0III103III5IIIPAUSEIII/b/f")
-        return 0
+        error = self.send_message("/f/bIII0III103III5IIIPAUSEIII/b/f", timeout=timeout)
+        # send_message 出现异常（如超时）时返回 None，按失败处理
+        return -1 if error is None else error
 
         # return error
 
@@ -1,13 +1,19 @@
 from pythonosc import dispatcher, udp_client
-from pythonosc.osc_server import ThreadingOSCUDPServer
+from pythonosc.osc_server import AsyncIOOSCUDPServer, ThreadingOSCUDPServer
+import asyncio
+import os
 import threading
 import time
-import math
+from concurrent.futures import ThreadPoolExecutor
+from functools import wraps
 from fairino import Robot
 import socket
-import struct
+from frames import FREC_EXT
 from recorder import PathRecorder, ask_open_path
 from player import PathPlayer
+from safety import SafetyLane
+from servo import ServoFilter, ServoScheduler, StreamCoalescer
+from telemetry import PacketFramer, TelemetryDecoder, TelemetryPublisher, frame_from_state_pkg
 
 
 # --- CONFIG ---
@@ -15,92 +21,90 @@ ROBOT_IP = "192.168.57.2"
 OSC_LISTEN_PORT = 9000
 OSC_SEND_IP = "192.168.57.255" 
 OSC_SEND_PORT = 8000
-
-# Global telemetry control
-telemetry_hz = 125.0  # Default 20 updates per second
-telemetry_interval = 1.0 / telemetry_hz 
+# OSC ingress:
+#   "asyncio"   — one event-loop thread handles packets in arrival order; handlers
+#                 that block on the SDK run on a small worker pool (OSC_WORKERS)
+#   "threading" — python-osc's ThreadingOSCUDPServer, one new thread per packet
+OSC_INGRESS = "asyncio"
+OSC_WORKERS = 4
+# Keep one persistent XML-RPC connection per thread (servo, polling, handlers)
+# instead of the SDK's shared default transport
+ROBOT_KEEPALIVE = True
+# Connect to the robot in the background so the OSC server binds immediately
+ROBOT_LAZY_CONNECT = True
+
+# Telemetry broadcast rate (change at runtime with /telemetry/hz)
+telemetry_hz = 125.0
+# Send each telemetry frame as one OSC bundle instead of six messages
+# (change at runtime with /telemetry/bundle)
+TELEMETRY_BUNDLE = False
+# Only send an address when it moved more than epsilon (0 = any change),
+# plus a keep-alive every TELEMETRY_KEEPALIVE seconds for late joiners.
+# Addresses left out are sent every frame. Tune with /telemetry/deadband.
+TELEMETRY_DEADBAND = {
+    "/j_pos":      0.001,  # degrees
+    "/tcp_pos":    0.01,   # mm / degrees
+    "/j_torq":     0.1,
+    "/ft_sens":    0.1,
+    "/robot_mode": 0,
+    "/error":      0,
+}
+TELEMETRY_KEEPALIVE = 1.0  # seconds
+
+# Where telemetry comes from:
+#   "sdk"  — reuse the SDK's own 20004 state stream (one connection, decoded once)
+#   "8083" — open the separate high-speed stream (adds base_error to /error)
+TELEMETRY_SOURCE = "sdk"
+# Drop 8083 packets whose checksum doesn't match (counted as corrupt in [Stats])
+TELEMETRY_VERIFY_CHECKSUM = True
+
+# Attempts for StopMotion / PauseMotion / ServoMoveEnd on the safety lane,
+# each one given up after SAFETY_RPC_TIMEOUT seconds
+SAFETY_RETRIES = 3
+SAFETY_RPC_TIMEOUT = 0.5
+
+# Write recordings to disk while recording (crash-safe, instant stop) and
+# fsync the partial file at most every RECORDING_FSYNC_INTERVAL seconds
+RECORDING_STREAM = True
+RECORDING_FSYNC_INTERVAL = 1.0
+# Default format for new recordings: "csv" (3 decimals, human-readable) or
+# "frec" (binary float32 columns, see frames.py). Both load for playback.
+RECORDING_FORMAT = "csv"
+# Where playback frames go (change at runtime with /playback/output):
+#   "osc"   — broadcast /j_pos_playback only; route it to /servoj yourself
+#   "robot" — feed the servo filter + ServoJ loop directly (needs /servo/start)
+#   "both"  — robot, and mirror /j_pos_playback for visualisation
+PLAYBACK_OUTPUT = "osc"
 
 # --- INIT ROBOT ---
-robot = Robot.RPC(ROBOT_IP)
+robot = Robot.RPC(ROBOT_IP, keepalive=ROBOT_KEEPALIVE, lazy=ROBOT_LAZY_CONNECT)
+# Stop-type calls bypass the SDK's endless retry loop and time out instead
+safety_robot = robot.command_proxy(timeout=SAFETY_RPC_TIMEOUT)
 
-recorder = PathRecorder(save_dir="recordings")
+recorder = PathRecorder(save_dir="recordings", stream=RECORDING_STREAM,
+                        fsync_interval=RECORDING_FSYNC_INTERVAL, file_format=RECORDING_FORMAT)
 
 
 # --- SERVO SPEED LIMITER CONFIG ---
-# --- SERVO SPEED LIMITER CONFIG ---
+# Defaults; change at runtime with /servo/limits, /servo/jerk or /servo/preset
 SERVO_MAX_SPEED = [140.0, 140.0, 140.0,  170.0, 170.0, 170.0]  # degrees/s  (j1-3, j4-6)
 SERVO_MAX_ACCEL = [2500.0, 2500.0, 2500.0,  2500.0, 2500.0, 2500.0]  # degrees/s²
+SERVO_MAX_JERK  = [30000.0, 30000.0, 30000.0,  50000.0, 50000.0, 50000.0]  # degrees/s³
+SERVO_MODE      = "accel"  # "accel" (trapezoid) or "jerk" (S-curve, uses SERVO_MAX_JERK)
 SERVO_DEADZONE  = 0.05  # degrees
+SERVO_CMD_T     = 0.008  # seconds between ServoJ commands (fixed, independent of /servoj rate)
 
-_servo_positions  = None   # [j1..j6] filtered position
-_servo_velocities = [0.0] * 6
-_servo_last_time  = None
 _latest_joint_pos = [0.0] * 6   # kept fresh by telemetry loop
 
-
-def _servo_filter(target_q: list[float]) -> list[float]:
-    """
-    Velocity- and acceleration-limited filter.
-    Mirrors the Chataigne JS filter exactly, hardcoded limits.
-    """
-    global _servo_positions, _servo_velocities, _servo_last_time
-
-    now = time.perf_counter()
-
-    # First call after (re)start: seed from real robot position
-    if _servo_positions is None:
-        _servo_positions  = list(_latest_joint_pos)
-        _servo_velocities = [0.0] * 6
-        _servo_last_time  = now
-        return list(_servo_positions)
-
-    dT = now - _servo_last_time
-    _servo_last_time = now
-
-    if dT <= 0:
-        dT = 1e-4
-
-    # Large gap protection (e.g. after pause)
-    if dT > 0.5:
-        _servo_positions  = list(target_q)
-        _servo_velocities = [0.0] * 6
-        return list(target_q)
-
-    result = []
-    for i in range(6):
-        pos    = _servo_positions[i]
-        vel    = _servo_velocities[i]
-        target = target_q[i]
-        dist   = target - pos
-
-        # Snap when close enough
-        if abs(dist) <= SERVO_DEADZONE:
-            _servo_positions[i]  = target
-            _servo_velocities[i] = 0.0
-            result.append(target)
-            continue
-
-        # Max safe velocity that allows stopping exactly at target
-        v_max = math.sqrt(2.0 * SERVO_MAX_ACCEL[i] * abs(dist))
-        if dist < 0:
-            v_max = -v_max
-
-        # Acceleration-limited velocity step
-        dv     = v_max - vel
-        max_dv = SERVO_MAX_ACCEL[i] * dT
-        dv     = max(-max_dv, min(max_dv, dv))
-        vel   += dv
-
-        # Speed clamp
-        vel = max(-SERVO_MAX_SPEED[i], min(SERVO_MAX_SPEED[i], vel))
-
-        pos += vel * dT
-
-        _servo_positions[i]  = pos
-        _servo_velocities[i] = vel
-        result.append(pos)
-
-    return result
+servo_filter = ServoFilter(
+    max_speed=SERVO_MAX_SPEED,
+    max_accel=SERVO_MAX_ACCEL,
+    deadzone=SERVO_DEADZONE,
+    seed=lambda: _latest_joint_pos,
+    max_jerk=SERVO_MAX_JERK,
+    mode=SERVO_MODE,
+)
+servo_scheduler = ServoScheduler(robot, step=servo_filter.step, halt=servo_filter.halt, cmd_t=SERVO_CMD_T)
 
 # --- MOTION HANDLERS ---
 def handle_movej(addr, *args):
@@ -148,41 +152,104 @@ def handle_drag(addr, state):
 
 def handle_jog(addr, *args):
     mode, ref, direction = args
-    robot.StartJog(mode, ref, direction, 20.0)
+    jog_stream.submit(("start", mode, ref, direction))
 
 def handle_jog_stop(addr):
-    robot.StopJog(1)
+    jog_stream.submit(("stop",))
+
+def _send_jog(cmd):
+    if cmd[0] == "start":
+        robot.StartJog(cmd[1], cmd[2], cmd[3], 20.0)
+    else:
+        robot.StopJog(1)
 
 
 # --- SERVO CONTROL (Streamed Motion) ---
 
 def handle_servo_start(addr):
-    global _servo_positions, _servo_velocities, _servo_last_time
+    epoch = _stream_epoch
     try:
         # Seed filter state from the live robot position
-        _servo_positions  = list(_latest_joint_pos)
-        _servo_velocities = [0.0] * 6
-        _servo_last_time  = time.perf_counter()
+        servo_filter.reset(_latest_joint_pos)
 
         ret = robot.ServoMoveStart()
         print(f"ServoStart: {ret if ret == 0 else f'FAILED ({ret})'}")
+        if ret != 0:
+            return
+        if epoch != _stream_epoch:
+            # /stop, /pause or /servo/stop arrived while ServoMoveStart was running
+            print("ServoStart: cancelled by a safety command")
+            robot.ServoMoveEnd()
+            return
+        servo_scheduler.start()
     except Exception as e:
         print(f"ServoStart Error: {e}")
 
 def handle_servo_stop(addr):
+    """Safety lane: stops sending at once, then ServoMoveEnd."""
+    safety_lane.trigger(addr, preempt=_halt_servo, action=_servo_stop)
+
+def _servo_stop():
+    # The scheduler was stopped in the preempt; a ServoJ in flight isn't waited for
+    ret = safety_robot.ServoMoveEnd()
+    print(f"ServoStop: {ret if ret == 0 else f'FAILED ({ret})'}")
+    return ret
+
+
+def handle_servo_limits(addr, *args):
+    """
+    /servo/limits speed accel                  → same limits on all joints
+    /servo/limits speed13 speed46 acc13 acc46  → separate j1-3 / j4-6 limits
+    """
+    try:
+        values = [float(x) for x in args]
+        if len(values) == 2:
+            servo_filter.set_limits(max_speed=values[0], max_accel=values[1])
+        elif len(values) == 4:
+            servo_filter.set_limits(max_speed=values[0:2], max_accel=values[2:4])
+        else:
+            print("ServoLimits: expected 2 or 4 arguments")
+            return
+        print(f"ServoLimits: speed {list(servo_filter.max_speed)}, accel {list(servo_filter.max_accel)}")
+    except Exception as e:
+        print(f"ServoLimits Error: {e}")
+
+def handle_servo_jerk(addr, *args):
+    """
+    /servo/jerk "accel" | "jerk"     → switch filter profile
+    /servo/jerk jerk                 → jerk mode, same max jerk on all joints
+    /servo/jerk jerk13 jerk46        → jerk mode, separate j1-3 / j4-6 max jerk
+    """
+    try:
+        if args and isinstance(args[0], str):
+            servo_filter.set_mode(args[0].strip().lower())
+        elif len(args) in (1, 2):
+            values = [float(x) for x in args]
+            servo_filter.set_limits(max_jerk=values[0] if len(values) == 1 else values)
+            servo_filter.set_mode("jerk")
+        else:
+            print("ServoJerk: expected a mode name or 1-2 jerk values")
+            return
+        print(f"ServoJerk: mode {servo_filter.mode}, jerk {list(servo_filter.max_jerk)}")
+    except Exception as e:
+        print(f"ServoJerk Error: {e}")
+
+def handle_servo_preset(addr, *args):
+    """/servo/preset ["name"]  — apply servoSpeed/servoAcceleration from name.json (default preset_0)"""
+    name = args[0].strip() if args and isinstance(args[0], str) and args[0].strip() else "preset_0"
+    if not name.endswith(".json"):
+        name += ".json"
     try:
-        ret = robot.ServoMoveEnd()
-        print(f"ServoStop: {ret if ret == 0 else f'FAILED ({ret})'}")
+        servo_filter.load_preset(name)
+        print(f"ServoPreset {name}: speed {list(servo_filter.max_speed)}, accel {list(servo_filter.max_accel)}")
     except Exception as e:
-        print(f"ServoStop Error: {e}")
+        print(f"ServoPreset Error: {e}")
 
 
 def handle_servoj(addr, *args):
+    """Only stores the target — servo_scheduler sends ServoJ every SERVO_CMD_T."""
     try:
-        target_q = [float(x) for x in args[:6]]
-        filtered_q = _servo_filter(target_q)
-        robot.ServoJ(joint_pos=filtered_q, axisPos=[0.0, 0.0, 0.0, 0.0], cmdT=0.01, acc=50, vel=50)
-        
+        servo_scheduler.submit([float(x) for x in args[:6]])
     except Exception:
         pass
 
@@ -208,61 +275,133 @@ def handle_servojt_stop(addr):
         pass
 
     
+# /servocart, /servocart_rel, /servojt and /jog go through a StreamCoalescer:
+# if packets arrive faster than the SDK accepts them, only the newest target
+# is sent (relative moves are summed instead), so latency can't build up.
+
 def handle_servocart(addr, *args):
     try:
-        
-        d_pos = [float(x) for x in args[:6]]
-        # interval: 0.001 to 0.008 (match your OSC rate)
-        # mode:  [0]-absolute motion (base coordinate system), [1]-incremental motion (base coordinate system), [2]-incremental motion (tool coordinate system);
-        robot.ServoCart(mode=0, desc_pos=d_pos, cmdT=0.01)
-        
+        servocart_stream.submit([float(x) for x in args[:6]])
     except Exception:
         pass
-    
+
 def handle_servocart_rel(addr, *args):
     try:
-        
-        d_pos = [float(x) for x in args[:6]]
-        # interval: 0.001 to 0.008 (match your OSC rate)
-        # mode:  [0]-absolute motion (base coordinate system), [1]-incremental motion (base coordinate system), [2]-incremental motion (tool coordinate system);
-        robot.ServoCart(mode=2, desc_pos=d_pos, cmdT=0.01)
-        
+        servocart_rel_stream.submit([float(x) for x in args[:6]])
     except Exception:
         pass
 
-
 def handle_servojt(addr, *args):
     try:
         # Args: t1, t2, t3, t4, t5, t6
-        torques = [float(x) for x in args[:6]]
-        # interval should match your OSC sender rate (e.g., 0.008)
-        robot.ServoJT(torque=torques, interval=0.008)
+        servojt_stream.submit([float(x) for x in args[:6]])
     except Exception: pass
+
+def handle_stream_stats(addr):
+    """Broadcasts sent / superseded counts per stream over OSC."""
+    streams = [("servoj", servo_scheduler.ticks, servo_scheduler.superseded)]
+    for name, stream in (("servocart", servocart_stream), ("servocart_rel", servocart_rel_stream),
+                         ("servojt", servojt_stream), ("jog", jog_stream)):
+        streams.append((name, stream.sent, stream.superseded))
+    for name, sent, superseded in streams:
+        client.send_message("/stream/stats", [name, sent, superseded])
+
+# interval: 0.001 to 0.008 (match your OSC rate)
+# mode:  [0]-absolute motion (base coordinate system), [1]-incremental motion (base coordinate system), [2]-incremental motion (tool coordinate system);
+def _send_servocart(d_pos):
+    robot.ServoCart(mode=0, desc_pos=d_pos, cmdT=0.01)
+
+def _send_servocart_rel(d_pos):
+    robot.ServoCart(mode=2, desc_pos=d_pos, cmdT=0.01)
+
+def _send_servojt(torques):
+    # interval should match your OSC sender rate (e.g., 0.008)
+    robot.ServoJT(torque=torques, interval=0.008)
+
+def _sum_deltas(older, newer):
+    return [a + b for a, b in zip(older, newer)]
     
     
 # --- STOP PAUSE RESUME ---
     
+# /stop, /pause and /servo/stop go through the safety lane: queued streamed
+# commands and servo targets are dropped right away, and the robot call runs
+# on a thread of its own with retries (StopMotion often fails on the first try).
+
+def drain_streams():
+    """Cancel streamed motion that hasn't reached the robot yet."""
+    global _stream_epoch
+    _stream_epoch += 1
+    if player.drives_robot:
+        player.stop(wait=0.1)   # no playback frame may reach the servo path after this
+    servo_scheduler.drain()
+    for stream in (servocart_stream, servocart_rel_stream, servojt_stream, jog_stream):
+        stream.drain()
+
+def _halt_servo():
+    """Drain, and stop the servo thread before any robot call: no ServoJ goes out after this."""
+    global _servo_paused
+    _servo_paused = False
+    drain_streams()
+    servo_scheduler.stop(wait=False)
+
 def handle_stop(addr):
-    try:
-        ret = robot.StopMotion()
-        if ret == 0:
-            print("Motion stopped")
-        else:
-            print(f"StopMotion failed with code: {ret}")
-    except Exception as e:
-        print(f"StopMotion never works on the first try... (weird error)")
+    end_servo = servo_scheduler.is_active
+
+    def preempt():
+        _halt_servo()
+        player.stop()
+
+    safety_lane.trigger(addr, preempt=preempt, action=lambda: _stop(end_servo))
+
+def _stop(end_servo):
+    # The scheduler was stopped in the preempt, so this doesn't wait for a
+    # slow ServoJ still in flight, and a failed attempt can't leave it running
+    ret = safety_robot.StopMotion()
+    if ret == 0:
+        print("Motion stopped")
+    else:
+        print(f"StopMotion failed with code: {ret}")
+    if end_servo:
+        try:
+            safety_robot.ServoMoveEnd()
+        except Exception as e:
+            print(f"ServoMoveEnd after stop failed: {e}")
+    return ret
+
+_servo_paused = False   # servo thread was running when /pause stopped it; /resume restarts it
 
 def handle_pause(addr):
-    ret = robot.PauseMotion()
+    def preempt():
+        global _servo_paused
+        _servo_paused = _servo_paused or servo_scheduler.is_active
+        drain_streams()
+        servo_scheduler.stop(wait=False)
+
+    safety_lane.trigger(addr, preempt=preempt, action=_pause)
+
+def _pause():
+    ret = robot.PauseMotion(timeout=SAFETY_RPC_TIMEOUT)
     if ret == 0:
         print("Motion Paused")
     else:
         print(f"PauseMotion failed with code: {ret}")
+    return ret
+
+def report_safety_latency(name, latency_ms, max_ms, ok):
+    client.send_message("/safety/latency", [name, round(latency_ms, 2), round(max_ms, 2), int(ok)])
 
 def handle_resume(addr):
+    global _servo_paused
+    epoch = _stream_epoch
     ret = robot.ResumeMotion()
     if ret == 0:
         print("Motion Resumed")
+        if _servo_paused and epoch == _stream_epoch:
+            # Servo mode is still on; carry on from where the robot stopped
+            _servo_paused = False
+            servo_filter.reset(_latest_joint_pos)
+            servo_scheduler.start()
     else:
         print(f"ResumeMotion failed with code: {ret}")
 
@@ -284,11 +423,23 @@ def handle_enable(addr, state):
         print(f"Enable Error: {e}")
 
 def handle_set_rate(addr, hz):
-    global telemetry_interval
-    # Ensure we don't divide by zero or go too fast
-    safe_hz = max(0.1, min(hz, 1000)) 
-    telemetry_interval = 1.0 / safe_hz
-    print(f"Telemetry rate set to {safe_hz}Hz ({telemetry_interval:.4f}s)")
+    safe_hz = telemetry_publisher.set_rate(hz)
+    print(f"Telemetry rate set to {safe_hz}Hz ({telemetry_publisher.interval:.4f}s)")
+
+def handle_set_deadband(addr, *args):
+    """
+    /telemetry/deadband "/j_pos" 0.01  → only send /j_pos when it moves > 0.01
+    /telemetry/deadband "/j_pos" -1    → send /j_pos every frame again
+    """
+    if len(args) < 2:
+        return
+    address, epsilon = str(args[0]), float(args[1])
+    telemetry_publisher.set_deadband(address, epsilon)
+    print(f"Telemetry deadband {address}: {epsilon if epsilon >= 0 else 'OFF'}")
+
+def handle_set_bundle(addr, state):
+    telemetry_publisher.bundle = bool(int(state))
+    print(f"Telemetry bundling: {'ON' if telemetry_publisher.bundle else 'OFF'}")
     
 # --- Recording handling ---
 
@@ -299,13 +450,13 @@ def handle_record_start(addr):
 def handle_record_stop(addr, *args):
     """
     /record/stop           → opens save dialog
-    /record/stop "myfile"  → saves directly to recordings/myfile.csv, skips dialog
+    /record/stop "myfile"  → saves directly to recordings/myfile.csv (or .frec), skips dialog
     """
     path = None
     if args and isinstance(args[0], str) and args[0].strip():
         name = args[0].strip()
-        if not name.endswith(".csv"):
-            name += ".csv"
+        if not name.endswith((".csv", FREC_EXT)):
+            name += FREC_EXT if RECORDING_FORMAT == "frec" else ".csv"
         path = f"recordings/{name}"
     recorder.stop_and_save(path)
 
@@ -324,15 +475,24 @@ def handle_record_status(addr):
 def handle_playback_load(addr, *args):
     """
     /playback/load           → opens file dialog
-    /playback/load "name"    → loads recordings/name.csv directly
+    /playback/load "name"    → loads recordings/name.frec or recordings/name.csv directly
     """
-    path = None
     if args and isinstance(args[0], str) and args[0].strip():
         name = args[0].strip()
-        if not name.endswith(".csv"):
-            name += ".csv"
-        path = f"recordings/{name}"
-    player.load(path)
+        if not name.endswith((".csv", FREC_EXT)):
+            name += FREC_EXT if os.path.exists(f"recordings/{name}{FREC_EXT}") else ".csv"
+        player.load(f"recordings/{name}")
+        return
+
+    def chosen(path):
+        # The dialog has a thread of its own; load back on the playback lane so
+        # the take can't change under a playback command queued meanwhile
+        if path:
+            playback_lane.submit(player.load, path)
+        else:
+            print("[Player] Load cancelled")
+
+    ask_open_path(save_dir=player.save_dir, callback=chosen)
 
 
 def handle_playback_start(addr, *args):
@@ -359,6 +519,12 @@ def handle_playback_scrub(addr, *args):
         player.scrub(float(args[0]))
 
 
+def handle_playback_scrub_time(addr, *args):
+    """/playback/scrub_time <seconds>  — preview interpolated pose at that time, no robot motion"""
+    if args:
+        player.scrub_time(float(args[0]))
+
+
 def handle_playback_trim_start(addr, *args):
     if args:
         player.trim_start(float(args[0]))
@@ -373,18 +539,36 @@ def handle_playback_undo_trim(addr):
     player.undo_trim()
 
 
+def handle_playback_export(addr, *args):
+    """/playback/export <"csv"|"frec">  — write the loaded take in that format"""
+    if args:
+        player.export(str(args[0]))
+
+
+def handle_playback_output(addr, *args):
+    """/playback/output <"osc"|"robot"|"both">"""
+    if args:
+        player.set_output(str(args[0]))
+
+
 def handle_playback_status(addr):
     player.send_status()
     
 
 class UniqueUpdateTracker:
-    def __init__(self, report_interval=1.0):
+    def __init__(self, report_interval=1.0, framer=None, osc_client=None):
         self.report_interval = report_interval
         self.last_report_time = time.perf_counter()
         self.last_joints = None
         self.unique_updates = 0
         self.total_reads = 0
 
+        # Optional: report stream health (dropped / corrupt frames) as well
+        self.framer = framer
+        self.osc_client = osc_client
+        self.last_dropped = 0
+        self.last_corrupt = 0
+
     def update(self, current_joints):
         now = time.perf_counter()
         self.total_reads += 1
@@ -398,8 +582,24 @@ class UniqueUpdateTracker:
         if now - self.last_report_time >= self.report_interval:
             elapsed = now - self.last_report_time
             rate = self.unique_updates / elapsed
-            print(f"[Stats] Reads: {self.total_reads} | Unique: {self.unique_updates} | Rate: {rate:.2f} Hz")
-            
+
+            line = f"[Stats] Reads: {self.total_reads} | Unique: {self.unique_updates} | Rate: {rate:.2f} Hz"
+            if self.framer is not None:
+                dropped = self.framer.dropped - self.last_dropped
+                corrupt = self.framer.corrupt - self.last_corrupt
+                self.last_dropped = self.framer.dropped
+                self.last_corrupt = self.framer.corrupt
+                line += f" | Dropped: {dropped} | Corrupt: {corrupt}"
+                if self.osc_client is not None:
+                    self.osc_client.send_message("/telemetry/stats", [
+                        self.total_reads,
+                        self.unique_updates,
+                        round(rate, 2),
+                        dropped,
+                        corrupt,
+                    ])
+            print(line)
+
             # Reset
             self.total_reads = 0
             self.unique_updates = 0
@@ -407,14 +607,69 @@ class UniqueUpdateTracker:
 
 
 
-# --- TELEMETRY LOOP ---
-def telemetry_loop(osc_client):
+class SdkStreamHealth:
+    """Dropped / corrupt counters for the SDK 20004 stream, read by UniqueUpdateTracker like a PacketFramer."""
+
+    def __init__(self, robot):
+        self._robot = robot
+        self.dropped = 0
+        self._last_cnt = None
+        self._last_corrupt = 0
+
+    @property
+    def corrupt(self):
+        return self._robot.state_checksum_errors
+
+    def count(self, frame_cnt):
+        # Frames rejected by the SDK checksum also leave a counter gap; count them only once
+        corrupt = self.corrupt
+        if self._last_cnt is not None:
+            gap = (frame_cnt - self._last_cnt - 1) & 0xFF
+            self.dropped += max(0, gap - (corrupt - self._last_corrupt))
+        self._last_cnt = frame_cnt
+        self._last_corrupt = corrupt
+
+
+def dispatch_frame(frame, stats_tracker, publisher):
+    """Hand one telemetry sample to every consumer."""
+    global _latest_joint_pos
+    joints = list(frame.joints)
+    _latest_joint_pos = joints
+
+    # --- UPDATE STATS ---
+    stats_tracker.update(joints)
+
+    # Recorder sees every raw frame; OSC goes out at telemetry_hz
+    recorder.add_frame(frame.joints, frame.tcp_pose)
+    publisher.submit(frame)
+
+
+# --- TELEMETRY FROM THE SDK STATE STREAM (20004) ---
+def start_sdk_telemetry(osc_client, publisher):
+    """Subscribe to the packets the SDK already receives instead of opening a second stream."""
+    health = SdkStreamHealth(robot)
+    stats_tracker = UniqueUpdateTracker(report_interval=1.0, framer=health, osc_client=osc_client)
+
+    def on_state(pkg):
+        frame = frame_from_state_pkg(pkg, stamp=time.time())
+        health.count(frame.frame_cnt)
+        dispatch_frame(frame, stats_tracker, publisher)
+
+    robot.add_state_listener(on_state)
+    print("Using SDK state stream (20004) for telemetry")
+
+
+# --- TELEMETRY LOOP (8083) ---
+def telemetry_loop(osc_client, publisher):
     ROBOT_IP = "192.168.57.2"
     PORT = 8083
-    
+
+    framer = PacketFramer(verify=TELEMETRY_VERIFY_CHECKSUM)
+    decoder = TelemetryDecoder()
+
     # Initialize the tracker
-    stats_tracker = UniqueUpdateTracker(report_interval=1.0)
-    
+    stats_tracker = UniqueUpdateTracker(report_interval=1.0, framer=framer, osc_client=osc_client)
+
     sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
     try:
         sock.connect((ROBOT_IP, PORT))
@@ -423,88 +678,19 @@ def telemetry_loop(osc_client):
         print(f"Failed to connect to 8083: {e}")
         return
 
-    buffer = b""
-
     while True:
         try:
-            # Receive data chunk
-            chunk = sock.recv(2048)
-            if not chunk:
+            # Receive straight into the framer's buffer
+            if not framer.fill(sock):
                 break
-            
-            buffer += chunk
 
             # Process all complete frames in the buffer
-            while len(buffer) >= 2:
-                # Find the 0x5A5A header
-                header_idx = buffer.find(b'\x5a\x5a')
-                
-                if header_idx == -1:
-                    # No header found, keep the last byte in case it's part of a header
-                    buffer = buffer[-1:]
-                    break
-                
-                # If we found a header, discard everything before it
-                if header_idx > 0:
-                    buffer = buffer[header_idx:]
-
-                # Check if we have enough data for a full header + count + length (5 bytes)
-                if len(buffer) < 5:
-                    break
-
-                # Read the data length from the packet (Offset 3, uint16)
-                data_len = struct.unpack_from('<H', buffer, 3)[0]
-                total_packet_size = 5 + data_len + 2 # Header(5) + Data + Checksum(2)
-
-                # Wait until the full packet is in the buffer
-                if len(buffer) < total_packet_size:
-                    break
-
-                # Extract the full packet
-                packet = buffer[:total_packet_size]
-                buffer = buffer[total_packet_size:]
-
+            for packet in framer.packets():
                 # --- UNPACK DATA ---
-
-                base_error = struct.unpack_from('<B', packet, 6)[0]
-
-                robot_mode = struct.unpack_from('<B', packet, 7)[0]
-                
-                # Offset 8: Start of jt_cur_pos[0] (6 joints * 8 bytes)
-                joints = struct.unpack_from('<6d', packet, 8)
-                global _latest_joint_pos
-                _latest_joint_pos = list(joints)
-                
-                # Offset 56: (8 meta + 48 joints)
-                tcp_pose = struct.unpack_from('<6d', packet, 56)
-
-                # Offset 108: (Skip toolNum int4)
-                torques = struct.unpack_from('<6d', packet, 108)
-                
-                # Offset 188: Force/Torque Sensor (6 * 8 bytes)
-                # (Serial 32 in manual)
-                ft_sensor = struct.unpack_from('<6d', packet, 184)
-
-                # --- UPDATE STATS ---
-                stats_tracker.update(list(joints))
-
-                # --- SEND OSC ---
-                osc_client.send_message("/j_pos", list(joints))
-                osc_client.send_message("/tcp_pos", list(tcp_pose))
-                osc_client.send_message("/j_torq", list(torques))
-                osc_client.send_message("/ft_sens", list(ft_sensor))
-                osc_client.send_message("/robot_mode", robot_mode)
-                
-                recorder.add_frame(joints, tcp_pose)
-                
-                # Offset 314: Fault Codes (Serial 67/68)
-                # We calculate this based on the Serial 67 position in the table
-                # Note: These are often 'int32' (4 bytes)
-                main_err = struct.unpack_from('<i', packet, 314)[0]
-                sub_err = struct.unpack_from('<i', packet, 318)[0]
-                
-                
-                osc_client.send_message("/error", [base_error, main_err, sub_err])
+                frame = decoder.decode(packet, stamp=time.time())
+                if frame is None:
+                    continue
+                dispatch_frame(frame, stats_tracker, publisher)
 
         except Exception as e:
             print(f"Stream Parse Error: {e}")
@@ -517,6 +703,9 @@ def polling_loop(osc_client):
     polling_hz = 50.0
     interval = 1.0 / polling_hz
 
+    # Don't poll before the SDK has finished connecting
+    if robot.wait_ready():
+        print("Robot connected")
     print(f"Started Status Polling Thread ({polling_hz}Hz)")
 
     while True:
@@ -539,64 +728,158 @@ def polling_loop(osc_client):
         
         time.sleep(interval)
 
+# --- OSC INGRESS WORKERS ---
+# Streamed motion (ServoCart, ServoJT, jog, servo mode changes) goes through one
+# ordered lane so targets reach the robot in the order they were sent; the
+# streams themselves are coalesced first so the lane never builds a backlog. Other
+# blocking SDK calls share a bounded pool. Cheap handlers run inline. Recording
+# and playback commands each get an ordered lane of their own: they depend on
+# each other (start after stop, scrub after trim), so none may overtake another.
+sdk_pool = ThreadPoolExecutor(max_workers=OSC_WORKERS, thread_name_prefix="osc-sdk")
+stream_lane = ThreadPoolExecutor(max_workers=1, thread_name_prefix="osc-stream")
+record_lane = ThreadPoolExecutor(max_workers=1, thread_name_prefix="osc-record")
+playback_lane = ThreadPoolExecutor(max_workers=1, thread_name_prefix="osc-playback")
+
+
+def _run_handler(handler, addr, args):
+    try:
+        handler(addr, *args)
+    except Exception as e:
+        print(f"Handler {addr} Error: {e}")
+
+
+_stream_epoch = 0   # bumped by drain_streams(); older queued stream commands are skipped
+
+def _run_stream_handler(handler, addr, args, epoch):
+    if epoch != _stream_epoch:
+        return
+    _run_handler(handler, addr, args)
+
+
+def offload(handler, executor=None):
+    """Run a blocking handler off the ingress thread (asyncio ingress only)."""
+    if OSC_INGRESS != "asyncio":
+        return handler
+    executor = executor or sdk_pool
+
+    @wraps(handler)
+    def submit(addr, *args):
+        executor.submit(_run_handler, handler, addr, args)
+        # Return nothing: python-osc sends handler return values back as replies
+
+    return submit
+
+
+def ordered(handler):
+    """Like offload(), on the single stream lane; skipped if a safety command drained it meanwhile."""
+    if OSC_INGRESS != "asyncio":
+        return handler
+
+    @wraps(handler)
+    def submit(addr, *args):
+        stream_lane.submit(_run_stream_handler, handler, addr, args, _stream_epoch)
+
+    return submit
+
+
+# Latest-wins coalescing for the streamed SDK calls, flushed on the stream lane
+servocart_stream = StreamCoalescer(_send_servocart, stream_lane)
+servocart_rel_stream = StreamCoalescer(_send_servocart_rel, stream_lane, merge=_sum_deltas)
+servojt_stream = StreamCoalescer(_send_servojt, stream_lane)
+jog_stream = StreamCoalescer(_send_jog, stream_lane)
+
+
 # --- SERVER START ---
 disp = dispatcher.Dispatcher()
-disp.map("/movej", handle_movej)
-disp.map("/movel", handle_movel)
-disp.map("/servo", handle_servo)
-disp.map("/drag", handle_drag)
+disp.map("/movej", offload(handle_movej))
+disp.map("/movel", offload(handle_movel))
+disp.map("/servo", ordered(handle_servo))
+disp.map("/drag", offload(handle_drag))
 disp.map("/jog", handle_jog)
 disp.map("/jog_stop", handle_jog_stop)
 disp.map("/telemetry/hz", handle_set_rate)
-disp.map("/stop", handle_stop)
-disp.map("/pause", handle_pause)
-disp.map("/resume", handle_resume)
-disp.map("/clear_error", handle_clear_error)
-disp.map("/enable", handle_enable)
+disp.map("/telemetry/bundle", handle_set_bundle)
+disp.map("/telemetry/deadband", handle_set_deadband)
+disp.map("/stop", handle_stop)          # safety lane
+disp.map("/pause", handle_pause)        # safety lane
+disp.map("/resume", offload(handle_resume))
+disp.map("/clear_error", offload(handle_clear_error))
+disp.map("/enable", offload(handle_enable))
 
 # Position Servo
-disp.map("/servo/start", handle_servo_start)
-disp.map("/servo/stop", handle_servo_stop)
+disp.map("/servo/start", ordered(handle_servo_start))
+disp.map("/servo/stop", handle_servo_stop)  # safety lane
+disp.map("/servo/limits", handle_servo_limits)
+disp.map("/servo/jerk", handle_servo_jerk)
+disp.map("/servo/preset", handle_servo_preset)
 disp.map("/servoj", handle_servoj)
 disp.map("/servocart", handle_servocart)
 disp.map("/servocart_rel", handle_servocart_rel)
 
 # Torque Servo
-disp.map("/servojt/start", handle_servojt_start)
-disp.map("/servojt/stop", handle_servojt_stop)
+disp.map("/servojt/start", ordered(handle_servojt_start))
+disp.map("/servojt/stop", ordered(handle_servojt_stop))
 disp.map("/servojt", handle_servojt)
+disp.map("/stream/stats", handle_stream_stats)
 
 # recording
-disp.map("/record/start",   handle_record_start)
-disp.map("/record/stop",    handle_record_stop)
-disp.map("/record/status",  handle_record_status)
+disp.map("/record/start",   offload(handle_record_start, record_lane))
+disp.map("/record/stop",    offload(handle_record_stop, record_lane))
+disp.map("/record/status",  offload(handle_record_status, record_lane))
 
 # playback
-disp.map("/playback/load",       handle_playback_load)
-disp.map("/playback/start",      handle_playback_start)
-disp.map("/playback/stop",       handle_playback_stop)
-disp.map("/playback/pause",      handle_playback_pause)
-disp.map("/playback/resume",     handle_playback_resume)
-disp.map("/playback/scrub",      handle_playback_scrub)
-disp.map("/playback/trim_start", handle_playback_trim_start)
-disp.map("/playback/trim_end",   handle_playback_trim_end)
-disp.map("/playback/undo_trim",  handle_playback_undo_trim)
-disp.map("/playback/status",     handle_playback_status)
-
-server = ThreadingOSCUDPServer(("0.0.0.0", OSC_LISTEN_PORT), disp)
-client = udp_client.SimpleUDPClient(OSC_SEND_IP, OSC_SEND_PORT)
-player = PathPlayer(client, save_dir="recordings")
+disp.map("/playback/load",       offload(handle_playback_load, playback_lane))
+disp.map("/playback/start",      offload(handle_playback_start, playback_lane))
+disp.map("/playback/stop",       offload(handle_playback_stop, playback_lane))
+disp.map("/playback/pause",      offload(handle_playback_pause, playback_lane))
+disp.map("/playback/resume",     offload(handle_playback_resume, playback_lane))
+disp.map("/playback/scrub",      offload(handle_playback_scrub, playback_lane))
+disp.map("/playback/scrub_time", offload(handle_playback_scrub_time, playback_lane))
+disp.map("/playback/trim_start", offload(handle_playback_trim_start, playback_lane))
+disp.map("/playback/trim_end",   offload(handle_playback_trim_end, playback_lane))
+disp.map("/playback/undo_trim",  offload(handle_playback_undo_trim, playback_lane))
+disp.map("/playback/export",     offload(handle_playback_export, playback_lane))
+disp.map("/playback/output",     offload(handle_playback_output, playback_lane))
+disp.map("/playback/status",     offload(handle_playback_status, playback_lane))
 
-# Start telemetry in a background thread
-threading.Thread(target=telemetry_loop, args=(client,), daemon=True).start()
+client = udp_client.SimpleUDPClient(OSC_SEND_IP, OSC_SEND_PORT)
+player = PathPlayer(client, save_dir="recordings", tick=SERVO_CMD_T,
+                    servo_source=servo_scheduler.set_source, servo_ready=lambda: servo_scheduler.is_active)
+player.set_output(PLAYBACK_OUTPUT)
+safety_lane = SafetyLane(retries=SAFETY_RETRIES, report=report_safety_latency)
+telemetry_publisher = TelemetryPublisher(
+    client,
+    hz=telemetry_hz,
+    bundle=TELEMETRY_BUNDLE,
+    deadband=TELEMETRY_DEADBAND,
+    keepalive=TELEMETRY_KEEPALIVE,
+)
+telemetry_publisher.start()
+
+# Start telemetry: SDK listener, or the 8083 stream in a background thread
+if TELEMETRY_SOURCE == "sdk":
+    start_sdk_telemetry(client, telemetry_publisher)
+else:
+    threading.Thread(target=telemetry_loop, args=(client, telemetry_publisher), daemon=True).start()
 
 # Start polling (SDK status queries)
 threading.Thread(target=polling_loop, args=(client,), daemon=True).start()
 
-print(f"Fairino Precision Bridge Active on port {OSC_LISTEN_PORT}")
+if OSC_INGRESS == "asyncio":
+    loop = asyncio.new_event_loop()
+    asyncio.set_event_loop(loop)
+    server = AsyncIOOSCUDPServer(("0.0.0.0", OSC_LISTEN_PORT), disp, loop)
+    loop.run_until_complete(server.create_serve_endpoint())
+else:
+    server = ThreadingOSCUDPServer(("0.0.0.0", OSC_LISTEN_PORT), disp)
+
+print(f"Fairino Precision Bridge Active on port {OSC_LISTEN_PORT} ({OSC_INGRESS} ingress)")
 print(f"Sending telemetry to {OSC_SEND_IP}:{OSC_SEND_PORT}")
 
-server.serve_forever()
+if OSC_INGRESS == "asyncio":
+    loop.run_forever()
+else:
+    server.serve_forever()
 
 
 
@@ -0,0 +1,524 @@
+import csv
+import math
+import mmap
+import struct
+import sys
+from array import array
+from bisect import bisect_right
+
+
+# ---------------------------------------------------------------------------
+# Frame layout
+# ---------------------------------------------------------------------------
+
+# One recorded frame: time since start, six joints, TCP pose
+FIELDNAMES = ("t", "j1", "j2", "j3", "j4", "j5", "j6",
+              "x", "y", "z", "rx", "ry", "rz")
+N_FIELDS = len(FIELDNAMES)
+UNITS = ("s", "deg", "deg", "deg", "deg", "deg", "deg",
+         "mm", "mm", "mm", "deg", "deg", "deg")
+
+_ROW = struct.Struct(f"{N_FIELDS}d")   # native doubles, same layout as array("d")
+
+
+# ---------------------------------------------------------------------------
+# FrameStore
+# ---------------------------------------------------------------------------
+
+class FrameStore:
+    """
+    Growable store of recorded frames in fixed-size float chunks.
+
+    Each chunk is a preallocated array("d") holding `chunk_frames` rows of
+    N_FIELDS doubles (104 bytes per frame, ~47 MB for an hour at 125 Hz).
+    append() writes one row with a single struct.pack_into() and allocates a
+    new chunk only when the current one is full, so it is O(1) and creates no
+    per-frame Python objects for the GC to track. Chunks are never resized,
+    so rows already written never move.
+
+    snapshot() returns a FrameSnapshot sharing the chunks (no copy). It only
+    covers the rows present at the time of the call; later appends don't
+    change it.
+
+    Usage
+    -----
+    store = FrameStore()
+    store.append(t, joints, tcp_pose)   # single writer (telemetry thread)
+    snap = store.snapshot()
+    for row in snap.rows():             # tuples in FIELDNAMES order
+        ...
+    """
+
+    def __init__(self, chunk_frames: int = 8192):
+        self.chunk_frames = chunk_frames
+        self._chunks: list[array] = []
+        self._count = 0
+        self._last_t = 0.0
+
+    def append(self, t: float, joints, tcp_pose):
+        row = self._count % self.chunk_frames
+        if row == 0:
+            self._chunks.append(array("d", bytes(8 * N_FIELDS * self.chunk_frames)))
+        _ROW.pack_into(self._chunks[-1], row * _ROW.size, t,
+                       joints[0], joints[1], joints[2], joints[3], joints[4], joints[5],
+                       tcp_pose[0], tcp_pose[1], tcp_pose[2], tcp_pose[3], tcp_pose[4], tcp_pose[5])
+        self._last_t = t
+        # Publish the row only after it is fully written
+        self._count += 1
+
+    def __len__(self) -> int:
+        return self._count
+
+    @property
+    def duration(self) -> float:
+        """Time of the last frame (seconds since start)."""
+        return self._last_t if self._count else 0.0
+
+    def snapshot(self) -> "FrameSnapshot":
+        count = self._count
+        n_chunks = -(-count // self.chunk_frames)
+        return FrameSnapshot(self._chunks[:n_chunks], count, self.chunk_frames)
+
+
+class FrameSnapshot:
+    """Read-only view of the first `count` frames of a FrameStore."""
+
+    def __init__(self, chunks: list, count: int, chunk_frames: int):
+        self._chunks = chunks
+        self._count = count
+        self._chunk_frames = chunk_frames
+
+    def __len__(self) -> int:
+        return self._count
+
+    @property
+    def duration(self) -> float:
+        return self.row(self._count - 1)[0] if self._count else 0.0
+
+    def columns(self) -> list[array]:
+        """One array("d") per field, in FIELDNAMES order."""
+        columns = [array("d") for _ in FIELDNAMES]
+        index = 0
+        for chunk in self._chunks:
+            end = min(self._chunk_frames, self._count - index) * N_FIELDS
+            for i, column in enumerate(columns):
+                column.extend(chunk[i:end:N_FIELDS])
+            index += self._chunk_frames
+        return columns
+
+    def row(self, index: int) -> tuple:
+        chunk, row = divmod(index, self._chunk_frames)
+        return _ROW.unpack_from(self._chunks[chunk], row * _ROW.size)
+
+    def rows(self, start: int = 0):
+        """Iterate frames from `start` as tuples in FIELDNAMES order."""
+        index = start
+        while index < self._count:
+            chunk, row = divmod(index, self._chunk_frames)
+            stop = min(self._chunk_frames, row + self._count - index)
+            view = memoryview(self._chunks[chunk]).cast("B")[row * _ROW.size:stop * _ROW.size]
+            yield from _ROW.iter_unpack(view)
+            index += stop - row
+
+
+# ---------------------------------------------------------------------------
+# Recording files
+# ---------------------------------------------------------------------------
+#
+# .frec binary layout (all little-endian):
+#
+#   header   magic "FREC", version u16, dtype "d"/"f", reserved u8,
+#            n_channels u32, n_frames u64, data_offset u64, sample_rate f64
+#   table    n_channels x (name 16 bytes, unit 8 bytes), NUL padded
+#   padding  up to data_offset (multiple of 8)
+#   data     one block of n_frames values per channel, in table order
+#
+# sample_rate is the mean rate of the take (frames / duration); the t column
+# holds the actual timestamps.
+
+FREC_EXT = ".frec"
+FREC_MAGIC = b"FREC"
+FREC_VERSION = 1
+# float32 keeps ~7 significant digits: finer than the CSV's 3 decimals for
+# joints, millimetres and an hour of t, at half the size of float64
+FREC_DTYPE = "f"
+
+_HEADER = struct.Struct("<4sHcBIQQd")
+_CHANNEL = struct.Struct("<16s8s")
+_BIG_ENDIAN = sys.byteorder == "big"
+
+
+def is_frec(path: str) -> bool:
+    return path.lower().endswith(FREC_EXT)
+
+
+def _mean_rate(t) -> float:
+    return (len(t) - 1) / (t[-1] - t[0]) if len(t) > 1 and t[-1] > t[0] else 0.0
+
+
+def write_frec(path: str, columns, dtype: str = FREC_DTYPE):
+    """Write columns (FIELDNAMES order, any sequence of floats) as .frec."""
+    n_frames = len(columns[0])
+    data_offset = _HEADER.size + _CHANNEL.size * N_FIELDS
+    data_offset += -data_offset % 8
+    header = _HEADER.pack(FREC_MAGIC, FREC_VERSION, dtype.encode(), 0,
+                          N_FIELDS, n_frames, data_offset, _mean_rate(columns[0]))
+    table = b"".join(_CHANNEL.pack(name.encode(), unit.encode())
+                     for name, unit in zip(FIELDNAMES, UNITS))
+    with open(path, "wb") as f:
+        f.write(header + table)
+        f.write(bytes(data_offset - len(header) - len(table)))
+        for column in columns:
+            block = column if isinstance(column, array) and column.typecode == dtype else array(dtype, column)
+            if _BIG_ENDIAN:
+                block = array(dtype, block)
+                block.byteswap()
+            block.tofile(f)
+
+
+def read_frec_header(buf) -> dict:
+    """Parse and check a .frec header from the start of `buf`."""
+    magic, version, dtype, _, n_channels, n_frames, data_offset, rate = _HEADER.unpack_from(buf)
+    if magic != FREC_MAGIC:
+        raise ValueError("not a .frec file")
+    if version != FREC_VERSION:
+        raise ValueError(f"unsupported .frec version {version}")
+    names, units = [], []
+    for i in range(n_channels):
+        name, unit = _CHANNEL.unpack_from(buf, _HEADER.size + i * _CHANNEL.size)
+        names.append(name.rstrip(b"\0").decode())
+        units.append(unit.rstrip(b"\0").decode())
+    if tuple(names[:N_FIELDS]) != FIELDNAMES:
+        raise ValueError(f"unexpected channels {names}")
+    return {"dtype": dtype.decode(), "n_frames": n_frames, "data_offset": data_offset,
+            "sample_rate": rate, "names": names, "units": units}
+
+
+def read_frec(path: str) -> list[array]:
+    """Read a .frec file into one array("d") per field (FIELDNAMES order)."""
+    with open(path, "rb") as f:
+        data = f.read()
+    header = read_frec_header(data)
+    dtype, n = header["dtype"], header["n_frames"]
+    block = n * array(dtype).itemsize
+    columns = []
+    for i in range(N_FIELDS):
+        start = header["data_offset"] + i * block
+        column = array(dtype, data[start:start + block])
+        if _BIG_ENDIAN:
+            column.byteswap()
+        columns.append(column if dtype == "d" else array("d", column))
+    return columns
+
+
+def write_csv(path: str, rows):
+    """Write rows (tuples in FIELDNAMES order) as CSV, 3 decimals."""
+    with open(path, "w", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(FIELDNAMES)
+        write_csv_rows(writer, rows)
+
+
+def write_csv_rows(writer, rows):
+    writer.writerows([f"{v:.3f}" for v in row] for row in rows)
+
+
+def read_csv(path: str) -> list[array]:
+    """Read a CSV recording into one array("d") per field (FIELDNAMES order)."""
+    columns = [array("d") for _ in FIELDNAMES]
+    with open(path, newline="") as f:
+        reader = csv.reader(f)
+        header = next(reader)
+        order = [header.index(name) for name in FIELDNAMES]
+        for row in reader:
+            if row:
+                for column, i in zip(columns, order):
+                    column.append(float(row[i]))
+    return columns
+
+
+def map_frec(path: str) -> tuple[list[memoryview], mmap.mmap]:
+    """
+    Memory-map a .frec file. Returns one read-only memoryview per field
+    (FIELDNAMES order) straight over the file's column blocks, plus the map
+    (close it once the views are released).
+    """
+    with open(path, "rb") as f:
+        mapping = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    try:
+        header = read_frec_header(mapping)
+        dtype, n = header["dtype"], header["n_frames"]
+        block = n * array(dtype).itemsize
+        view = memoryview(mapping)
+        columns = []
+        for i in range(N_FIELDS):
+            start = header["data_offset"] + i * block
+            columns.append(view[start:start + block].cast(dtype))
+        view.release()
+    except Exception:
+        mapping.close()
+        raise
+    return columns, mapping
+
+
+# ---------------------------------------------------------------------------
+# Recording
+# ---------------------------------------------------------------------------
+
+class Recording:
+    """
+    A loaded take held as one column per field.
+
+    Columns are array("d") (CSV, trimmed copies) or memoryviews over a
+    memory-mapped .frec file, so memory scales with the file's bytes and
+    loading costs no per-frame objects. Index them directly: rec.t[i],
+    rec.joints(i), rec.columns[FIELDNAMES.index("x")][a:b].
+
+    Usage
+    -----
+    rec = load_recording("recordings/take.frec")
+    rec.t[-1], rec.joints(0)
+    joints, tcp = rec.sample(12.5)     # interpolated pose at t = 12.5 s
+    trimmed = rec.slice(100, len(rec), rezero=True)
+    rec.close()   # before overwriting a mapped file
+    """
+
+    def __init__(self, columns: list, mapping: mmap.mmap | None = None):
+        self.columns = columns
+        self._mapping = mapping
+        self.t = columns[0]
+        self._joint_columns = columns[1:7]
+
+    def __len__(self) -> int:
+        return len(self.t)
+
+    @property
+    def duration(self) -> float:
+        return self.t[-1] if len(self.t) else 0.0
+
+    @property
+    def is_mapped(self) -> bool:
+        return self._mapping is not None
+
+    def joints(self, index: int) -> list:
+        return [column[index] for column in self._joint_columns]
+
+    def tcp(self, index: int) -> list:
+        return [column[index] for column in self.columns[7:13]]
+
+    def index_at(self, t: float) -> int:
+        """Last frame at or before time t (clamped to the take). O(log n)."""
+        return max(0, min(bisect_right(self.t, t) - 1, len(self.t) - 1))
+
+    def sample(self, t: float) -> tuple[list, list]:
+        """
+        Pose at time t, interpolated between the two frames around it:
+        linear for joints and TCP position, slerp for TCP orientation.
+        Clamps to the first / last frame outside the take.
+        """
+        a = self.index_at(t)
+        b = min(a + 1, len(self.t) - 1)
+        span = self.t[b] - self.t[a]
+        u = min(max((t - self.t[a]) / span, 0.0), 1.0) if span > 0 else 0.0
+        if u == 0.0:
+            return self.joints(a), self.tcp(a)
+
+        cols = self.columns
+        joints = [c[a] + (c[b] - c[a]) * u for c in self._joint_columns]
+        tcp = [c[a] + (c[b] - c[a]) * u for c in cols[7:10]]
+        qa = _rpy_to_quat(cols[10][a], cols[11][a], cols[12][a])
+        qb = _rpy_to_quat(cols[10][b], cols[11][b], cols[12][b])
+        return joints, tcp + _quat_to_rpy(_slerp(qa, qb, u))
+
+    def rows(self):
+        """Iterate frames as tuples in FIELDNAMES order."""
+        return zip(*self.columns)
+
+    def slice(self, start: int, stop: int, rezero: bool = False) -> "Recording":
+        """Copy frames [start, stop) into a new in-memory Recording."""
+        columns = [array("d", column[start:stop]) for column in self.columns]
+        if rezero and len(columns[0]):
+            offset = columns[0][0]
+            columns[0] = array("d", [t - offset for t in columns[0]])
+        return Recording(columns)
+
+    def close(self):
+        """Release a memory-mapped file. In-memory recordings are unaffected."""
+        if self._mapping is None:
+            return
+        for column in self.columns:
+            column.release()
+        self._mapping.close()
+        self._mapping = None
+
+
+# ---------------------------------------------------------------------------
+# Orientation helpers — rx, ry, rz are fixed-axis XYZ angles in degrees
+# (R = Rz · Ry · Rx), as reported by the controller
+# ---------------------------------------------------------------------------
+
+def _rpy_to_quat(rx: float, ry: float, rz: float) -> tuple:
+    hx, hy, hz = math.radians(rx) / 2, math.radians(ry) / 2, math.radians(rz) / 2
+    cx, sx = math.cos(hx), math.sin(hx)
+    cy, sy = math.cos(hy), math.sin(hy)
+    cz, sz = math.cos(hz), math.sin(hz)
+    return (cz * cy * cx + sz * sy * sx,
+            cz * cy * sx - sz * sy * cx,
+            cz * sy * cx + sz * cy * sx,
+            sz * cy * cx - cz * sy * sx)
+
+
+def _quat_to_rpy(q: tuple) -> list:
+    w, x, y, z = q
+    rx = math.atan2(2 * (w * x + y * z), 1 - 2 * (x * x + y * y))
+    ry = math.asin(max(-1.0, min(1.0, 2 * (w * y - z * x))))
+    rz = math.atan2(2 * (w * z + x * y), 1 - 2 * (y * y + z * z))
+    return [math.degrees(rx), math.degrees(ry), math.degrees(rz)]
+
+
+def _slerp(qa: tuple, qb: tuple, u: float) -> tuple:
+    aw, ax, ay, az = qa
+    bw, bx, by, bz = qb
+    dot = aw * bw + ax * bx + ay * by + az * bz
+    if dot < 0.0:                       # take the short way round
+        bw, bx, by, bz, dot = -bw, -bx, -by, -bz, -dot
+    if dot > 0.9995:                    # nearly parallel: lerp and renormalise
+        wa, wb = 1.0 - u, u
+    else:
+        theta = math.acos(dot)
+        sin_theta = math.sin(theta)
+        wa = math.sin((1 - u) * theta) / sin_theta
+        wb = math.sin(u * theta) / sin_theta
+    w, x, y, z = wa * aw + wb * bw, wa * ax + wb * bx, wa * ay + wb * by, wa * az + wb * bz
+    n = math.sqrt(w * w + x * x + y * y + z * z)
+    return w / n, x / n, y / n, z / n
+
+
+def load_recording(path: str, use_mmap: bool = True) -> Recording:
+    """Load a .csv or .frec take. .frec files are memory-mapped when possible."""
+    if not is_frec(path):
+        return Recording(read_csv(path))
+    if use_mmap and not _BIG_ENDIAN:
+        return Recording(*map_frec(path))
+    return Recording(read_frec(path))
+
+
+# ---------------------------------------------------------------------------
+# Resampling
+# ---------------------------------------------------------------------------
+
+def _grid_ticks(t, step: float) -> tuple[int, int]:
+    """(regular ticks, total ticks incl. a final tick on the last frame) for a resample grid."""
+    if not len(t):
+        return 0, 0
+    ticks = int((t[-1] - t[0]) / step + 1e-9) + 1
+    return ticks, ticks + (1 if t[-1] - (t[0] + (ticks - 1) * step) > 1e-9 else 0)
+
+
+def resample_length(rec: Recording, dt: float, speed: float = 1.0) -> int:
+    """Number of frames resample() produces for the whole take."""
+    return _grid_ticks(rec.t, dt * speed)[1]
+
+
+def resample(rec: Recording, dt: float, speed: float = 1.0,
+             start: int = 0, stop: int | None = None) -> Recording:
+    """
+    Resample a take onto a uniform grid for playback at one frame every `dt`
+    seconds (e.g. the ServoJ cmdT) and `speed`x. Grid frame k sits at
+    recording time t[0] + k * dt * speed; the last frame is the take's last
+    pose. Same interpolation as Recording.sample(), done in one forward pass
+    over the source (O(n + ticks)). start / stop select grid frames
+    [start, stop) only, e.g. to build a long take piece by piece.
+    """
+    src = rec.columns
+    t = rec.t
+    n = len(t)
+    out = [array("d") for _ in FIELDNAMES]
+    step = dt * speed
+    ticks, total = _grid_ticks(t, step)
+    stop = total if stop is None else min(stop, total)
+    if n == 0 or start >= stop:
+        return Recording(out)
+
+    t0, t_end = t[0], t[-1]
+    grid = [t0 + k * step if k < ticks else t_end for k in range(start, stop)]
+
+    lerp_columns = list(zip(src[1:10], out[1:10]))
+    rx, ry, rz = src[10:13]
+    out_rx, out_ry, out_rz = out[10:13]
+    out[0].extend(grid)
+
+    a = max(0, min(rec.index_at(grid[0]), n - 2))
+    b = min(a + 1, n - 1)
+    ta, tb = t[a], t[b]
+    ra, rb = (rx[a], ry[a], rz[a]), (rx[b], ry[b], rz[b])
+    qa = qb = None    # quaternions of ra / rb, converted once per source frame
+    for tk in grid:
+        while a < n - 2 and tb <= tk:
+            a, b = a + 1, b + 1
+            ta, tb = tb, t[b]
+            ra, rb = rb, (rx[b], ry[b], rz[b])
+            qa, qb = qb, None
+        span = tb - ta
+        u = min(max((tk - ta) / span, 0.0), 1.0) if span > 0 else 0.0
+
+        for column, target in lerp_columns:
+            va = column[a]
+            target.append(va + (column[b] - va) * u)
+
+        if u == 0.0 or ra == rb:
+            r = ra
+        elif u == 1.0:
+            r = rb
+        else:
+            qa = qa or _rpy_to_quat(*ra)
+            qb = qb or _rpy_to_quat(*rb)
+            r = _quat_to_rpy(_slerp(qa, qb, u))
+        out_rx.append(r[0])
+        out_ry.append(r[1])
+        out_rz.append(r[2])
+
+    return Recording(out)
+
+
+class ChunkedResample:
+    """
+    resample() built on demand for playback, which reads forward.
+
+    With chunk_ticks set, frames are built chunk_ticks at a time when first
+    read and only the chunk in use is kept, so neither memory nor the work
+    before the first frame grows with the take. With chunk_ticks=None the
+    whole grid is built on first read and kept (worth caching for short takes).
+
+    Usage
+    -----
+    grid = ChunkedResample(rec, dt=0.008, speed=1.0, chunk_ticks=256)
+    for k in range(len(grid)):
+        chunk, base = grid.chunk_at(k)
+        chunk.joints(k - base)
+    """
+
+    def __init__(self, rec: Recording, dt: float, speed: float = 1.0, chunk_ticks: int | None = None):
+        self._rec = rec
+        self.dt = dt
+        self.speed = speed
+        self._len = resample_length(rec, dt, speed)
+        self.chunk_ticks = chunk_ticks or max(self._len, 1)
+        self._chunk: Recording | None = None
+        self._base = -1
+
+    def __len__(self) -> int:
+        return self._len
+
+    @property
+    def nbytes(self) -> int:
+        """Memory held once fully built."""
+        return min(self.chunk_ticks, self._len) * N_FIELDS * 8
+
+    def chunk_at(self, k: int) -> tuple[Recording, int]:
+        """The chunk holding grid frame k, and the grid index of its first frame."""
+        base = k - k % self.chunk_ticks
+        if base != self._base:
+            self._chunk = resample(self._rec, self.dt, self.speed, base, base + self.chunk_ticks)
+            self._base = base
+        return self._chunk, base
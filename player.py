@@ -1,13 +1,42 @@
-import csv
+import os
+import queue
 import threading
 import time
 
+from frames import FREC_EXT, ChunkedResample, Recording, is_frec, load_recording, resample_length, write_csv, write_frec
+
+# Grids up to this many ticks (10 min at 8 ms, ~8 MB) are built whole and cached;
+# longer ones are built RESAMPLE_CHUNK ticks at a time while they play
+RESAMPLE_WHOLE_MAX_TICKS = 75_000
+RESAMPLE_CHUNK = 256
+RESAMPLE_CACHE_BYTES = 32 * 1024 * 1024   # total size of cached grids
+OUTPUT_MODES = ("osc", "robot", "both")
+SERVO_QUEUE_FRAMES = 4   # robot output: frames resampled ahead of the scheduler's pull
+
 
 class PathPlayer:
     """
-    Plays back a recorded CSV path by broadcasting joint positions over OSC.
+    Plays back a recorded path (.csv or .frec) by broadcasting joint positions over OSC.
     Chataigne (or any OSC router) decides what to do with those positions.
 
+    With output "robot" (or "both") playback drives the servo filter and
+    fixed-rate ServoJ loop in-process, without a round trip through another
+    application: `servo_source(pull)`, normally ServoScheduler.set_source,
+    makes the scheduler pull one frame per ServoJ, so its clock paces the
+    playback and no frame is repeated or dropped. `servo_ready()` must be
+    true (servo mode started) for such playback to begin. Scrub never moves
+    the robot.
+
+    Frames are held as a frames.Recording: one array per channel, mapped
+    straight from disk for .frec files, so loading costs no per-frame objects.
+
+    Playback runs on a fixed clock: the take is resampled onto a uniform grid
+    of one frame per `tick` seconds (at the chosen speed) and frame k is sent
+    at start + k * tick. For takes up to RESAMPLE_WHOLE_MAX_TICKS the grid is
+    built whole, cached per (file, tick, speed) within RESAMPLE_CACHE_BYTES,
+    and the 1.0x grid is built in the background right after loading. Longer
+    takes are resampled a chunk at a time as playback reaches them.
+
     Trim commands are DESTRUCTIVE: they modify the in-memory frames and
     immediately overwrite the source file.
 
@@ -17,24 +46,36 @@ class PathPlayer:
         /playback/stop                   — stop playback
         /playback/pause                  — pause
         /playback/resume                 — resume from pause
-        /playback/scrub <0.0–1.0>        — preview a single frame (no playback)
+        /playback/scrub <0.0–1.0>        — preview the pose at that point in time (no playback)
+        /playback/scrub_time <seconds>   — preview the pose at t = seconds (no playback)
         /playback/trim_start <0.0–1.0>   — remove everything before this point, re-zero timestamps, save
         /playback/trim_end   <0.0–1.0>   — remove everything after this point, save
+        /playback/export <csv|frec>      — save a copy next to the loaded file in the other format
+        /playback/output <osc|robot|both> — where playback frames go
         /playback/status                 — request status broadcast
 
     Joint output address:  /j_pos_playback  [j1, j2, j3, j4, j5, j6]
+    Scrub also sends:      /tcp_pos_playback [x, y, z, rx, ry, rz]
 
     Status broadcast on /playback/status:
         [is_playing, is_paused, current_frame, total_frames, current_position, duration]
     """
 
-    def __init__(self, osc_client, save_dir: str = "recordings"):
+    def __init__(self, osc_client, save_dir: str = "recordings", tick: float = 0.008,
+                 servo_source=None, servo_ready=None):
         self._client = osc_client
         self.save_dir = save_dir
+        self.tick = tick   # seconds between sent frames (match the ServoJ cmdT)
+
+        self.output = "osc"
+        self._servo_source = servo_source # servo_source(pull or None), e.g. ServoScheduler.set_source
+        self._servo_ready = servo_ready   # servo_ready() -> bool
 
-        self._frames: list[dict] = []
+        self._rec: Recording | None = None
         self._loaded_path: str | None = None
         self._backup_path: str | None = None
+        self._resample_cache: dict = {}   # (path, tick, speed) -> (source Recording, ChunkedResample)
+        self._resample_lock = threading.Lock()
 
         self._is_playing = False
         self._is_paused  = False
@@ -56,27 +97,40 @@ class PathPlayer:
     def is_paused(self) -> bool:
         return self._is_paused
 
+    @property
+    def drives_robot(self) -> bool:
+        """True while playback is feeding the servo path."""
+        return self._is_playing and self.output != "osc"
+
     @property
     def frame_count(self) -> int:
-        return len(self._frames)
+        return len(self._rec) if self._rec else 0
 
     @property
     def duration(self) -> float:
-        return self._frames[-1]["t"] if self._frames else 0.0
+        return self._rec.duration if self._rec else 0.0
 
     @property
     def current_position(self) -> float:
-        """Current playback position as 0.0–1.0."""
-        if not self._frames:
+        """Current playback position as 0.0–1.0 of the take's duration."""
+        if not self._rec:
             return 0.0
-        return self._current_frame_idx / max(len(self._frames) - 1, 1)
+        t = self._rec.t
+        span = t[-1] - t[0]
+        return (t[self._current_frame_idx] - t[0]) / span if span > 0 else 0.0
+
+    def _time_at(self, position: float) -> float:
+        """Normalised 0.0–1.0 position → time in the take (same mapping as scrub and trim)."""
+        t = self._rec.t
+        position = max(0.0, min(1.0, position))
+        return t[0] + position * (t[-1] - t[0])
 
     # ------------------------------------------------------------------
     # Load
     # ------------------------------------------------------------------
 
     def load(self, path: str | None = None):
-        """Load a CSV recording. Opens a file dialog if path is falsy."""
+        """Load a .csv or .frec recording. Opens a file dialog if path is falsy."""
         if self._is_playing:
             print("[Player] Cannot load while playing")
             return
@@ -91,35 +145,91 @@ class PathPlayer:
             print("[Player] Load cancelled")
             return
         try:
-            with open(path, newline="") as f:
-                frames = [
-                    {k: float(v) for k, v in row.items()}
-                    for row in csv.DictReader(f)
-                ]
-            self._frames = frames
+            rec = load_recording(path)
+            self._set_recording(rec)
             self._loaded_path = path
             self._backup_path = None
             self._current_frame_idx = 0
-            print(f"[Player] Loaded {len(frames)} frames ({self.duration:.2f}s) from {path}")
+            print(f"[Player] Loaded {len(rec)} frames ({self.duration:.2f}s) from {path}"
+                  + (" (mapped)" if rec.is_mapped else ""))
             self._send_status()
+            if resample_length(rec, self.tick) <= RESAMPLE_WHOLE_MAX_TICKS:
+                threading.Thread(target=self._warm_resample, args=(rec,), daemon=True).start()
         except Exception as e:
             print(f"[Player] Load failed: {e}")
 
+    def _set_recording(self, rec: Recording | None):
+        """Swap in a new recording and release the old one's file mapping."""
+        old, self._rec = self._rec, rec
+        self._resample_cache.clear()
+        if old is not None and old is not rec:
+            try:
+                old.close()
+            except BufferError:
+                pass   # a view is still in use; the mapping closes when it is collected
+
+    # ------------------------------------------------------------------
+    # Resampling
+    # ------------------------------------------------------------------
+
+    def _resampled(self, rec: Recording, speed: float) -> ChunkedResample:
+        """
+        Uniform grid of `rec` for playback at `speed`. Short takes are built
+        whole and cached per (file, tick, speed); long ones come back unbuilt
+        and are resampled chunk by chunk as they play.
+        """
+        if resample_length(rec, self.tick, speed) > RESAMPLE_WHOLE_MAX_TICKS:
+            return ChunkedResample(rec, self.tick, speed, chunk_ticks=RESAMPLE_CHUNK)
+
+        key = (self._loaded_path, self.tick, speed)
+        with self._resample_lock:
+            cached = self._resample_cache.get(key)
+            if cached and cached[0] is rec:
+                return cached[1]
+            t0 = time.perf_counter()
+            grid = ChunkedResample(rec, self.tick, speed)
+            grid.chunk_at(0)   # build it now
+            print(f"[Player] Resampled to {len(grid)} ticks of {self.tick * 1000:.0f} ms at {speed:.2f}x "
+                  f"in {(time.perf_counter() - t0) * 1000:.0f} ms")
+            if rec is self._rec:
+                self._resample_cache[key] = (rec, grid)
+                # Evict oldest first until the cache fits its byte budget
+                while sum(g.nbytes for _, g in self._resample_cache.values()) > RESAMPLE_CACHE_BYTES:
+                    self._resample_cache.pop(next(iter(self._resample_cache)))
+            return grid
+
+    def _warm_resample(self, rec: Recording):
+        try:
+            self._resampled(rec, 1.0)
+        except Exception as e:
+            if rec is self._rec:
+                print(f"[Player] Resample failed: {e}")
+
     # ------------------------------------------------------------------
     # Scrub (non-destructive preview)
     # ------------------------------------------------------------------
 
     def scrub(self, position: float):
         """
-        Broadcast the frame at normalised position 0.0–1.0 to /j_pos_playback.
+        Broadcast the pose at normalised position 0.0–1.0 of the duration.
         Does not modify any data. Only works when not playing.
         """
-        if not self._frames or self._is_playing:
+        if not self._rec or self._is_playing:
             return
-        position = max(0.0, min(1.0, position))
-        idx = int(position * (len(self._frames) - 1))
-        self._current_frame_idx = idx
-        self._client.send_message("/j_pos_playback", _joints(self._frames[idx]))
+        self.scrub_time(self._time_at(position))
+
+    def scrub_time(self, seconds: float):
+        """
+        Broadcast the pose at t = seconds to /j_pos_playback and /tcp_pos_playback,
+        interpolated between the frames around it. O(log n) per call.
+        Does not modify any data. Only works when not playing.
+        """
+        if not self._rec or self._is_playing:
+            return
+        joints, tcp = self._rec.sample(seconds)
+        self._current_frame_idx = self._rec.index_at(seconds)
+        self._client.send_message("/j_pos_playback", joints)
+        self._client.send_message("/tcp_pos_playback", tcp)
         self._send_status()
 
     # ------------------------------------------------------------------
@@ -128,24 +238,22 @@ class PathPlayer:
 
     def trim_start(self, position: float):
         """
-        Remove all frames before the normalised position.
+        Remove all frames before the normalised position (the frame scrub
+        shows for the same value is kept).
         Timestamps are re-zeroed so the first remaining frame starts at t=0.
         The source file is overwritten immediately.
         """
         if self._is_playing:
             print("[Player] Cannot trim while playing")
             return
-        if not self._frames:
+        if not self._rec:
             return
-        position = max(0.0, min(1.0, position))
-        idx = int(position * (len(self._frames) - 1))
+        idx = self._rec.index_at(self._time_at(position))
         if idx == 0:
             print("[Player] Trim start: nothing to remove")
             return
-        t_offset = self._frames[idx]["t"]
-        self._frames = self._frames[idx:]
-        for frame in self._frames:
-            frame["t"] -= t_offset
+        t_offset = self._rec.t[idx]
+        self._set_recording(self._rec.slice(idx, len(self._rec), rezero=True))
         self._current_frame_idx = 0
         print(f"[Player] Trimmed start: removed {idx} frames ({t_offset:.3f}s)")
         self._write_backup()
@@ -160,16 +268,15 @@ class PathPlayer:
         if self._is_playing:
             print("[Player] Cannot trim while playing")
             return
-        if not self._frames:
+        if not self._rec:
             return
-        position = max(0.0, min(1.0, position))
-        idx = int(position * (len(self._frames) - 1))
-        if idx >= len(self._frames) - 1:
+        idx = self._rec.index_at(self._time_at(position))
+        if idx >= len(self._rec) - 1:
             print("[Player] Trim end: nothing to remove")
             return
-        removed = len(self._frames) - idx - 1
-        self._frames = self._frames[: idx + 1]
-        self._current_frame_idx = min(self._current_frame_idx, len(self._frames) - 1)
+        removed = len(self._rec) - idx - 1
+        self._set_recording(self._rec.slice(0, idx + 1))
+        self._current_frame_idx = min(self._current_frame_idx, len(self._rec) - 1)
         print(f"[Player] Trimmed end: removed {removed} frames")
         self._write_backup()
         self._write()
@@ -185,6 +292,7 @@ class PathPlayer:
             return
         import shutil
         try:
+            self._set_recording(None)   # unmap before overwriting the file
             shutil.copy2(self._backup_path, self._loaded_path)
             print(f"[Player] Restored backup → {self._loaded_path}")
             self._backup_path = None
@@ -195,7 +303,6 @@ class PathPlayer:
     def _write_backup(self):
         if not self._loaded_path:
             return
-        import os
         folder = os.path.dirname(self._loaded_path)
         filename = os.path.basename(self._loaded_path)
         self._backup_path = os.path.join(folder, f"backup_{filename}")
@@ -206,33 +313,64 @@ class PathPlayer:
             print(f"[Player] Backup failed: {e}")
             self._backup_path = None
 
-    def _write(self):
-        if not self._loaded_path:
+    def _write(self, path: str | None = None):
+        path = path or self._loaded_path
+        if not path:
             print("[Player] No file path to save to")
             return
         try:
-            fieldnames = ["t", "j1", "j2", "j3", "j4", "j5", "j6",
-                          "x",  "y",  "z",  "rx", "ry", "rz"]
-            with open(self._loaded_path, "w", newline="") as f:
-                writer = csv.DictWriter(f, fieldnames=fieldnames)
-                writer.writeheader()
-                for frame in self._frames:
-                    writer.writerow({k: f"{v:.3f}" for k, v in frame.items()})
-            print(f"[Player] Saved {len(self._frames)} frames → {self._loaded_path}")
+            if is_frec(path):
+                write_frec(path, self._rec.columns)
+            else:
+                write_csv(path, self._rec.rows())
+            print(f"[Player] Saved {len(self._rec)} frames → {path}")
         except Exception as e:
             print(f"[Player] Save failed: {e}")
 
+    def export(self, file_format: str):
+        """Save a copy of the loaded recording as "csv" or "frec" next to the source file."""
+        if not self._rec or not self._loaded_path:
+            print("[Player] No file loaded")
+            return
+        ext = {"csv": ".csv", "frec": FREC_EXT}.get(file_format.lower().lstrip("."))
+        if ext is None:
+            print(f"[Player] Unknown export format '{file_format}' (csv or frec)")
+            return
+        path = os.path.splitext(self._loaded_path)[0] + ext
+        if os.path.abspath(path) == os.path.abspath(self._loaded_path):
+            print(f"[Player] Already {file_format}: {path}")
+            return
+        self._write(path)
+
     # ------------------------------------------------------------------
     # Playback control
     # ------------------------------------------------------------------
 
+    def set_output(self, mode: str):
+        """Send playback frames over "osc", to the "robot" servo path, or "both"."""
+        mode = mode.strip().lower()
+        if mode not in OUTPUT_MODES:
+            print(f"[Player] Unknown output '{mode}' (osc, robot or both)")
+            return
+        if self._is_playing:
+            print("[Player] Cannot change output while playing")
+            return
+        if mode != "osc" and self._servo_source is None:
+            print("[Player] No servo path available for robot output")
+            return
+        self.output = mode
+        print(f"[Player] Output: {mode}")
+
     def start(self, speed: float = 1.0):
         if self._is_playing:
             print("[Player] Already playing")
             return
-        if not self._frames:
+        if not self._rec:
             print("[Player] No file loaded")
             return
+        if self.output != "osc" and self._servo_ready is not None and not self._servo_ready():
+            print("[Player] Robot output needs servo mode — send /servo/start first")
+            return
         speed = max(0.01, float(speed))
         self._stop_event.clear()
         self._pause_event.set()
@@ -243,11 +381,19 @@ class PathPlayer:
         )
         self._thread.start()
 
-    def stop(self):
+    def stop(self, wait: float = 0.0):
+        """
+        Stop playback. With wait > 0, also wait up to that long for the
+        playback thread to exit, so no frame reaches the servo path after
+        this returns (used by the safety commands).
+        """
         if not self._is_playing:
             return
         self._pause_event.set()   # unblock pause-hold loop
         self._stop_event.set()
+        thread = self._thread
+        if wait > 0 and thread is not None and thread is not threading.current_thread():
+            thread.join(wait)
 
     def pause(self):
         if self._is_playing and not self._is_paused:
@@ -268,43 +414,17 @@ class PathPlayer:
     # ------------------------------------------------------------------
 
     def _play_loop(self, speed: float):
-        frames = self._frames   # play the full (possibly trimmed) recording
+        rec = self._rec   # play the full (possibly trimmed) recording
 
         try:
-            print(f"[Player] Playback - {len(frames)} frames at {speed:.2f}x speed")
-
-            t0_wall = time.perf_counter()
-            t0_rec  = frames[0]["t"]
-
-            for i, frame in enumerate(frames):
-                if self._stop_event.is_set():
-                    break
-
-                # --- pause hold ---
-                # Wait until resumed; compensate t0_wall so timing stays correct.
-                if not self._pause_event.is_set():
-                    pause_started = time.perf_counter()
-                    self._pause_event.wait()
-                    t0_wall += time.perf_counter() - pause_started
-
-                if self._stop_event.is_set():
-                    break
-
-                # --- timing ---
-                self._current_frame_idx = i
-                target_elapsed = (frame["t"] - t0_rec) / speed
-                sleep_t = (t0_wall + target_elapsed) - time.perf_counter()
-                if sleep_t > 0:
-                    time.sleep(sleep_t)
-
-                # --- broadcast ---
-                self._client.send_message("/j_pos_playback", _joints(frame))
-
-                # Periodic status update (~every 0.5 s at 100 Hz)
-                if i % 50 == 0:
-                    self._send_status()
-
-            print("[Player] Playback complete")
+            grid = self._resampled(rec, speed)
+            print(f"[Player] Playback - {len(rec)} frames at {speed:.2f}x speed, {len(grid)} ticks → {self.output}")
+            if self.output == "osc":
+                self._play_clocked(rec, grid)
+            else:
+                self._play_servo(rec, grid)
+            if not self._stop_event.is_set():
+                print("[Player] Playback complete")
 
         except Exception as e:
             print(f"[Player] Error: {e}")
@@ -314,6 +434,111 @@ class PathPlayer:
             self._is_paused  = False
             self._send_status()
 
+    def _play_clocked(self, rec: Recording, grid: ChunkedResample):
+        """OSC output: frame k is sent at start + k * tick on this thread's clock."""
+        tick = self.tick
+        status_every = max(1, round(0.5 / tick))
+        t0_wall = time.perf_counter()
+        k = 0
+
+        while k < len(grid):
+            if self._stop_event.is_set():
+                break
+
+            # --- pause hold ---
+            # Wait until resumed; compensate t0_wall so timing stays correct.
+            if not self._pause_event.is_set():
+                pause_started = time.perf_counter()
+                self._pause_event.wait()
+                t0_wall += time.perf_counter() - pause_started
+
+            if self._stop_event.is_set():
+                break
+
+            grid.chunk_at(k)   # build a new chunk before waiting, not after
+
+            # --- timing ---
+            # Frame k is due at t0_wall + k * tick. If we fell behind, jump
+            # to the tick that is due now instead of sending a burst.
+            now = time.perf_counter()
+            due = t0_wall + k * tick
+            if due > now:
+                time.sleep(due - now)
+            elif now - due >= tick:
+                k = min(int((now - t0_wall) / tick), len(grid) - 1)
+
+            chunk, base = grid.chunk_at(k)
+            self._current_frame_idx = rec.index_at(chunk.t[k - base])
+            self._client.send_message("/j_pos_playback", chunk.joints(k - base))
+
+            # Periodic status update (~every 0.5 s)
+            if k % status_every == 0:
+                self._send_status()
+            k += 1
+
+    def _play_servo(self, rec: Recording, grid: ChunkedResample):
+        """
+        Robot output: this thread resamples a few frames ahead into a queue
+        and the servo scheduler pulls exactly one per ServoJ tick, so the
+        scheduler's clock paces playback. While paused or stopped the pull
+        returns None and the robot holds the last frame.
+        """
+        tick = self.tick
+        status_every = max(1, round(0.5 / tick))
+        mirror = self.output == "both"
+        frames = queue.Queue(maxsize=SERVO_QUEUE_FRAMES)
+
+        def pull():
+            if self._stop_event.is_set() or not self._pause_event.is_set():
+                return None
+            try:
+                index, joints = frames.get_nowait()
+            except queue.Empty:
+                return None   # producer behind: hold, don't skip
+            self._current_frame_idx = index
+            if mirror:
+                self._client.send_message("/j_pos_playback", joints)
+            return joints
+
+        self._servo_source(pull)
+        try:
+            for k in range(len(grid)):
+                chunk, base = grid.chunk_at(k)
+                item = (rec.index_at(chunk.t[k - base]), chunk.joints(k - base))
+                while not self._put(frames, item, tick):
+                    if self._stop_event.is_set():
+                        return
+                if k % status_every == 0:
+                    self._send_status()
+
+            # Let the scheduler take the last frames before letting go
+            while not frames.empty() and self._wait_servo(tick):
+                pass
+        finally:
+            self._servo_source(None)
+
+    def _put(self, frames: queue.Queue, item, tick: float) -> bool:
+        """Queue item for the scheduler; False after a tick without room (or if playback must end)."""
+        if not self._wait_servo(0.0):
+            return False
+        try:
+            frames.put(item, timeout=tick)
+            return True
+        except queue.Full:
+            return False
+
+    def _wait_servo(self, timeout: float) -> bool:
+        """Sleep `timeout`; False if playback was stopped or servo mode ended meanwhile."""
+        if timeout > 0:
+            self._stop_event.wait(timeout)
+        if self._stop_event.is_set():
+            return False
+        if self._servo_ready is not None and not self._servo_ready():
+            print("[Player] Servo mode ended — stopping playback")
+            self._stop_event.set()
+            return False
+        return True
+
     # ------------------------------------------------------------------
     # Status
     # ------------------------------------------------------------------
@@ -332,11 +557,3 @@ class PathPlayer:
         """Public — call from /playback/status OSC handler."""
         self._send_status()
 
-
-# ------------------------------------------------------------------
-# Helper
-# ------------------------------------------------------------------
-
-def _joints(frame: dict) -> list:
-    return [frame["j1"], frame["j2"], frame["j3"],
-            frame["j4"], frame["j5"], frame["j6"]]
@@ -1,20 +1,29 @@
 import csv
 import os
+import shutil
+import tempfile
 import threading
 import time
 from datetime import datetime
 from queue import Queue
 
-import tkinter as tk
-from tkinter import filedialog
+from frames import FIELDNAMES, FREC_EXT, FrameSnapshot, FrameStore, is_frec, write_csv, write_csv_rows, write_frec
 
 
 # ---------------------------------------------------------------------------
-# Dialog helpers — each runs tkinter in its own thread to avoid blocking OSC
+# Dialog helpers — each runs tkinter in its own thread to avoid blocking OSC.
+# tkinter is imported on first use so it doesn't slow down server startup.
 # ---------------------------------------------------------------------------
 
+_FILETYPES = [("Recordings", "*.csv *" + FREC_EXT), ("CSV recordings", "*.csv"),
+              ("Binary recordings", "*" + FREC_EXT), ("All files", "*.*")]
+
+
 def _ask_save_path_thread(default_name: str, save_dir: str, result_queue: Queue):
     """Runs in a background thread. Puts the chosen path (or None) into result_queue."""
+    import tkinter as tk
+    from tkinter import filedialog
+
     root = tk.Tk()
     root.withdraw()
     root.attributes("-topmost", True)  # bring dialog to front
@@ -23,8 +32,8 @@ def _ask_save_path_thread(default_name: str, save_dir: str, result_queue: Queue)
         title="Save Recording",
         initialdir=os.path.abspath(save_dir),
         initialfile=default_name,
-        defaultextension=".csv",
-        filetypes=[("CSV recordings", "*.csv"), ("All files", "*.*")],
+        defaultextension=os.path.splitext(default_name)[1] or ".csv",
+        filetypes=_FILETYPES,
     )
     root.destroy()
     result_queue.put(path if path else None)
@@ -32,6 +41,9 @@ def _ask_save_path_thread(default_name: str, save_dir: str, result_queue: Queue)
 
 def _ask_open_path_thread(save_dir: str, result_queue: Queue):
     """Runs in a background thread. Puts the chosen path (or None) into result_queue."""
+    import tkinter as tk
+    from tkinter import filedialog
+
     root = tk.Tk()
     root.withdraw()
     root.attributes("-topmost", True)
@@ -39,7 +51,7 @@ def _ask_open_path_thread(save_dir: str, result_queue: Queue):
         parent=root,
         title="Load Recording",
         initialdir=os.path.abspath(save_dir),
-        filetypes=[("CSV recordings", "*.csv"), ("All files", "*.*")],
+        filetypes=_FILETYPES,
     )
     root.destroy()
     result_queue.put(path if path else None)
@@ -73,6 +85,71 @@ def ask_open_path(save_dir: str, callback):
     threading.Thread(target=run, daemon=True).start()
 
 
+# ---------------------------------------------------------------------------
+# Write-through to disk
+# ---------------------------------------------------------------------------
+
+class _StreamWriter:
+    """
+    Background thread that appends new frames from a FrameStore to a CSV file.
+
+    The store itself is the queue: the telemetry thread keeps appending to it
+    and never waits on disk; every `interval` seconds this thread writes the
+    rows past its cursor, flushes, and fsyncs at most every `fsync_interval`
+    seconds. finish() writes the tail, fsyncs and closes the file, then
+    calls `then()` (in this thread).
+    """
+
+    def __init__(self, store: FrameStore, path: str, interval: float = 0.2, fsync_interval: float = 1.0):
+        self.store = store
+        self.path = path
+        self.interval = interval
+        self.fsync_interval = fsync_interval
+        self.written = 0        # cursor into the store
+        self.error = None
+
+        self._then = None
+        self._stop = threading.Event()
+        self._done = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def finish(self, then=None):
+        """Ask the thread to write the remaining frames and close. Returns immediately."""
+        self._then = then
+        self._stop.set()
+
+    def wait(self, timeout: float | None = None) -> bool:
+        return self._done.wait(timeout)
+
+    def _run(self):
+        try:
+            with open(self.path, "w", newline="") as f:
+                writer = csv.writer(f)
+                writer.writerow(FIELDNAMES)
+                last_sync = time.monotonic()
+                while True:
+                    stopping = self._stop.wait(self.interval)
+                    snapshot = self.store.snapshot()
+                    if len(snapshot) > self.written:
+                        write_csv_rows(writer, snapshot.rows(self.written))
+                        self.written = len(snapshot)
+                        f.flush()
+                    if stopping or time.monotonic() - last_sync >= self.fsync_interval:
+                        f.flush()
+                        os.fsync(f.fileno())
+                        last_sync = time.monotonic()
+                    if stopping:
+                        break
+        except Exception as e:
+            self.error = e
+            print(f"[Recorder] Stream write failed: {e}")
+        finally:
+            self._done.set()
+        if self._then is not None:
+            self._then()
+
+
 # ---------------------------------------------------------------------------
 # PathRecorder
 # ---------------------------------------------------------------------------
@@ -93,13 +170,27 @@ class PathRecorder:
     recorder.start()
     recorder.stop_and_save()          # opens save dialog
     recorder.stop_and_save("my_path") # saves directly to that path
+
+    With stream=True frames are also written to a unique
+    save_dir/rec_<time>_<random>.csv.partial while recording (fsynced every
+    `fsync_interval` seconds), so a crash loses at most that much. Stop returns at once; the partial file is
+    completed in the background and renamed to the chosen path.
+
+    file_format picks the default extension: "csv" or "frec" (binary
+    float32, ~7 significant digits, see frames.py). A path given to
+    stop_and_save() is saved in the format its extension names.
     """
 
-    def __init__(self, save_dir: str = "recordings"):
+    def __init__(self, save_dir: str = "recordings", stream: bool = False, fsync_interval: float = 1.0,
+                 file_format: str = "csv"):
         self.save_dir = save_dir
         os.makedirs(save_dir, exist_ok=True)
+        self.file_format = file_format
+        self.stream = stream
+        self.fsync_interval = fsync_interval
 
-        self._frames: list[dict] = []
+        self._frames = FrameStore()
+        self._writer: _StreamWriter | None = None
         self._start_time: float | None = None
         self._lock = threading.Lock()
         self.is_recording = False
@@ -113,25 +204,26 @@ class PathRecorder:
             if self.is_recording:
                 print("[Recorder] Already recording — ignoring start")
                 return
-            self._frames = []
+            self._frames = FrameStore()
             self._start_time = time.perf_counter()
+            if self.stream:
+                # Unique name: a take started within the same second as the last
+                # one must not share (and have renamed away) its partial file
+                fd, partial = tempfile.mkstemp(suffix=".csv.partial", prefix=_default_filename("_"),
+                                               dir=self.save_dir)
+                os.close(fd)
+                self._writer = _StreamWriter(self._frames, partial, fsync_interval=self.fsync_interval)
             self.is_recording = True
-            print("[Recorder] Recording started")
+            print("[Recorder] Recording started" + (f" (streaming to {self._writer.path})" if self._writer else ""))
 
     def add_frame(self, joints: tuple | list, tcp_pose: tuple | list):
         """Call this from your telemetry loop at ~100 Hz."""
         if not self.is_recording:
             return
         t = time.perf_counter() - self._start_time
-        frame = {
-            "t":  t,
-            "j1": joints[0], "j2": joints[1], "j3": joints[2],
-            "j4": joints[3], "j5": joints[4], "j6": joints[5],
-            "x":  tcp_pose[0], "y":  tcp_pose[1], "z":  tcp_pose[2],
-            "rx": tcp_pose[3], "ry": tcp_pose[4], "rz": tcp_pose[5],
-        }
         with self._lock:
-            self._frames.append(frame)
+            if self.is_recording:
+                self._frames.append(t, joints, tcp_pose)
 
     def stop_and_save(self, path: str | None = None):
         """
@@ -144,43 +236,76 @@ class PathRecorder:
                 print("[Recorder] Not recording — ignoring stop")
                 return
             self.is_recording = False
-            frames_snapshot = list(self._frames)
+            frames_snapshot = self._frames.snapshot()
+            writer, self._writer = self._writer, None
 
-        duration = frames_snapshot[-1]["t"] if frames_snapshot else 0
+        duration = frames_snapshot.duration
         print(f"[Recorder] Stopped — {len(frames_snapshot)} frames, {duration:.2f}s")
 
         if path:
-            self._write(frames_snapshot, path)
+            if writer:
+                writer.finish(then=lambda: self._save(frames_snapshot, path, writer))
+            else:
+                self._write(frames_snapshot, path)
         else:
-            default_name = _default_filename()
+            if writer:
+                writer.finish()
+            default_name = _default_filename(FREC_EXT if self.file_format == "frec" else ".csv")
             ask_save_path(
                 default_name=default_name,
                 save_dir=self.save_dir,
-                callback=lambda p: self._on_save_dialog(frames_snapshot, p, default_name),
+                callback=lambda p: self._on_save_dialog(frames_snapshot, p, default_name, writer),
             )
 
-    def _on_save_dialog(self, frames: list, path: str | None, fallback_name: str):
+    def _on_save_dialog(self, frames: FrameSnapshot, path: str | None, fallback_name: str,
+                        writer: _StreamWriter | None = None):
         if path:
-            self._write(frames, path)
+            self._save(frames, path, writer)
         else:
             # Cancelled — autosave so nothing is lost
             fallback = os.path.join(self.save_dir, fallback_name)
             print(f"[Recorder] Dialog cancelled — autosaving to {fallback}")
-            self._write(frames, fallback)
+            self._save(frames, fallback, writer)
 
-    def _write(self, frames: list, path: str):
+    def _save(self, frames: FrameSnapshot, path: str, writer: _StreamWriter | None):
+        """Move the streamed file into place, or write from memory if there is none."""
+        if writer is None:
+            self._write(frames, path)
+            return
+        writer.wait()
+        if is_frec(path):
+            # The stream is CSV; a binary save is one write per column from memory
+            if self._write(frames, path) and writer.error is None:
+                os.remove(writer.path)
+            return
+        if writer.error is not None or writer.written != len(frames):
+            print("[Recorder] Streamed file incomplete — writing from memory instead")
+            self._write(frames, path)
+            return
         try:
             os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
-            fieldnames = ["t", "j1", "j2", "j3", "j4", "j5", "j6",
-                          "x", "y", "z", "rx", "ry", "rz"]
-            with open(path, "w", newline="") as f:
-                writer = csv.DictWriter(f, fieldnames=fieldnames)
-                writer.writeheader()
-                for frame in frames:
-                    writer.writerow({k: f"{v:.3f}" for k, v in frame.items()})
+            try:
+                os.replace(writer.path, path)
+            except OSError:
+                # Different drive — copy, then drop the partial file
+                shutil.copyfile(writer.path, path)
+                os.remove(writer.path)
+            print(f"[Recorder] Saved {writer.written} frames → {path}")
+        except Exception as e:
+            print(f"[Recorder] Save failed: {e} — partial file kept at {writer.path}")
+
+    def _write(self, frames: FrameSnapshot, path: str) -> bool:
+        try:
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+            if is_frec(path):
+                write_frec(path, frames.columns())
+            else:
+                write_csv(path, frames.rows())
             print(f"[Recorder] Saved {len(frames)} frames → {path}")
+            return True
         except Exception as e:
             print(f"[Recorder] Save failed: {e}")
+            return False
 
     # ------------------------------------------------------------------
     # Convenience
@@ -188,20 +313,16 @@ class PathRecorder:
 
     @property
     def frame_count(self) -> int:
-        with self._lock:
-            return len(self._frames)
+        return len(self._frames)
 
     @property
     def duration(self) -> float:
-        with self._lock:
-            if not self._frames:
-                return 0.0
-            return self._frames[-1]["t"]
+        return self._frames.duration
 
 
 # ---------------------------------------------------------------------------
 # Default filename helper
 # ---------------------------------------------------------------------------
 
-def _default_filename() -> str:
-    return f"rec_{datetime.now().strftime('%Y-%m-%d_%H-%M-%S')}.csv"
+def _default_filename(ext: str = ".csv") -> str:
+    return f"rec_{datetime.now().strftime('%Y-%m-%d_%H-%M-%S')}{ext}"
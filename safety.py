@@ -0,0 +1,96 @@
+import queue
+import threading
+import time
+
+
+# ---------------------------------------------------------------------------
+# SafetyLane
+# ---------------------------------------------------------------------------
+
+class SafetyLane:
+    """
+    High-priority path for stop-type commands (/stop, /pause, /servo/stop).
+
+    trigger() is called straight from the OSC handler. It runs the preempt
+    step inline (cheap: drop queued streamed targets so nothing new goes out)
+    and hands the robot call to a thread that does nothing else, so it never
+    waits behind servo or playback traffic. Each command name gets its own
+    thread, so a /pause that is still retrying never delays a /stop. The
+    robot call is retried on an exception or non-zero return code, up to
+    `retries` attempts; actions should use an RPC timeout so every attempt
+    is bounded.
+
+    Latency is measured from trigger() to the end of the robot call and kept
+    per command (last / max / count); `report` is called after each command.
+
+    Usage
+    -----
+    lane = SafetyLane(report=lambda name, ms, max_ms, ok: ...)
+    lane.trigger("/stop", preempt=drain_streams, action=robot.StopMotion)
+    """
+
+    def __init__(self, retries: int = 3, retry_delay: float = 0.01, report=None):
+        self.retries = retries
+        self.retry_delay = retry_delay   # seconds between attempts
+        self._report = report            # report(name, latency_ms, max_ms, ok)
+
+        self._lanes = {}                 # name -> queue served by that name's thread
+        self._lanes_lock = threading.Lock()
+        self.stats = {}                  # name -> {"count", "failed", "last_ms", "max_ms"}
+
+    def trigger(self, name: str, action, preempt=None):
+        """Preempt inline, then queue action() for the safety thread. Returns immediately."""
+        t0 = time.perf_counter()
+        if preempt is not None:
+            try:
+                preempt()
+            except Exception as e:
+                print(f"[Safety] {name} preempt error: {e}")
+        self._lane(name).put((name, action, t0))
+
+    # ------------------------------------------------------------------
+    # Safety threads
+    # ------------------------------------------------------------------
+
+    def _lane(self, name: str) -> queue.SimpleQueue:
+        lane = self._lanes.get(name)
+        if lane is None:
+            with self._lanes_lock:
+                lane = self._lanes.get(name)
+                if lane is None:
+                    lane = queue.SimpleQueue()
+                    threading.Thread(target=self._run, args=(lane,), daemon=True).start()
+                    self._lanes[name] = lane
+        return lane
+
+    def _run(self, lane: queue.SimpleQueue):
+        while True:
+            name, action, t0 = lane.get()
+            ok = self._attempt(name, action)
+            latency_ms = (time.perf_counter() - t0) * 1000.0
+
+            s = self.stats.setdefault(name, {"count": 0, "failed": 0, "last_ms": 0.0, "max_ms": 0.0})
+            s["count"] += 1
+            s["failed"] += 0 if ok else 1
+            s["last_ms"] = latency_ms
+            s["max_ms"] = max(s["max_ms"], latency_ms)
+
+            print(f"[Safety] {name} {'done' if ok else 'FAILED'} in {latency_ms:.1f} ms (max {s['max_ms']:.1f} ms)")
+            if self._report is not None:
+                try:
+                    self._report(name, latency_ms, s["max_ms"], ok)
+                except Exception as e:
+                    print(f"[Safety] report error: {e}")
+
+    def _attempt(self, name, action) -> bool:
+        for attempt in range(1, self.retries + 1):
+            try:
+                ret = action()
+                if not ret:
+                    return True
+                print(f"[Safety] {name} attempt {attempt} returned {ret}")
+            except Exception as e:
+                print(f"[Safety] {name} attempt {attempt} error: {e}")
+            if attempt < self.retries:
+                time.sleep(self.retry_delay)
+        return False
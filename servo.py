@@ -0,0 +1,540 @@
+import json
+import math
+import threading
+import time
+from array import array
+
+
+N_AXES = 6
+
+
+# ---------------------------------------------------------------------------
+# TargetSlot
+# ---------------------------------------------------------------------------
+
+class TargetSlot:
+    """
+    Single-slot, latest-wins mailbox.
+
+    Writers put() whenever a new target arrives; the reader take()s the
+    newest one at its own pace. Older targets that were never taken are
+    simply overwritten. put() and take() are a single reference
+    assignment each, so no lock is needed.
+    """
+
+    def __init__(self):
+        self._item = None    # (value,) — wrapped so identity marks "new"
+        self._taken = None
+        self.superseded = 0  # values overwritten before anyone took them
+
+    def put(self, value):
+        item = self._item
+        if item is not None and item is not self._taken:
+            self.superseded += 1
+        self._item = (value,)
+
+    def take(self):
+        """Newest value since the last take(), or None if nothing new arrived."""
+        item = self._item
+        if item is None or item is self._taken:
+            return None
+        self._taken = item
+        return item[0]
+
+    def clear(self):
+        self._item = None
+        self._taken = None
+
+
+# ---------------------------------------------------------------------------
+# StreamCoalescer
+# ---------------------------------------------------------------------------
+
+class StreamCoalescer:
+    """
+    Latest-wins stage in front of one blocking SDK stream (ServoCart, ServoJT, jog).
+
+    submit() only stores the value and, if no flush is pending yet, queues
+    one on `executor` (the single ordered stream lane, so the call still
+    lands in order with servo start/stop). While the lane is busy further
+    values replace the pending one and are counted in `superseded`; the
+    flush then sends only the newest. Backlog therefore never grows beyond
+    one value per stream.
+
+    For incremental streams pass merge(older, newer) to combine superseded
+    values instead of dropping them.
+
+    Usage
+    -----
+    cart = StreamCoalescer(lambda pose: robot.ServoCart(0, pose), executor=lane)
+    cart.submit(pose)      # from the OSC handler, never blocks
+    cart.drain()           # drop whatever is pending (safety stop)
+    """
+
+    def __init__(self, send, executor, merge=None):
+        self._send = send
+        self._executor = executor
+        self._merge = merge
+
+        self._lock = threading.Lock()
+        self._pending = None
+        self._has_pending = False
+        self._scheduled = False
+
+        self.sent = 0
+        self.superseded = 0
+        self.errors = 0
+
+    def submit(self, value):
+        with self._lock:
+            if self._has_pending:
+                self.superseded += 1
+                if self._merge is not None:
+                    value = self._merge(self._pending, value)
+            self._pending = value
+            self._has_pending = True
+            if self._scheduled:
+                return
+            self._scheduled = True
+        self._executor.submit(self._flush)
+
+    def drain(self):
+        with self._lock:
+            self._pending = None
+            self._has_pending = False
+
+    def _flush(self):
+        with self._lock:
+            value = self._pending
+            has_value = self._has_pending
+            self._pending = None
+            self._has_pending = False
+            self._scheduled = False
+        if not has_value:
+            return
+        try:
+            self._send(value)
+            self.sent += 1
+        except Exception:
+            self.errors += 1
+
+
+# ---------------------------------------------------------------------------
+# ServoFilter
+# ---------------------------------------------------------------------------
+
+SERVO_MODES = ("accel", "jerk")
+
+
+class ServoFilter:
+    """
+    Velocity- and acceleration-limited filter for six joints, with an
+    optional jerk limit.
+
+    In "accel" mode this is the same motion as the Chataigne
+    speed_limiter_servo.js filter, but limits are per axis and can be changed
+    at runtime. In "jerk" mode acceleration itself ramps at max_jerk
+    (S-curve), so reversals and stops no longer kick the arm with an
+    instant acceleration step. State lives in fixed-size float arrays, so
+    one instance per robot or per stream is cheap.
+
+    Limits accept a scalar (all axes), a pair (j1-3, j4-6 — the split the
+    Chataigne script uses) or six values.
+
+    Usage
+    -----
+    f = ServoFilter(max_speed=(140, 170), max_accel=2500)
+    f.reset(current_joints)
+    filtered = f.step(target_joints)         # dt measured with perf_counter
+    filtered = f.step(target_joints, 0.008)  # or given explicitly (offline)
+    f.set_limits(max_speed=100)
+    f.set_mode("jerk")                       # S-curve, uses max_jerk
+    """
+
+    def __init__(self, max_speed=140.0, max_accel=2500.0, deadzone: float = 0.05,
+                 seed=None, max_jerk=30000.0, mode: str = "accel"):
+        self.max_speed = array("d", _per_axis(max_speed))   # degrees/s
+        self.max_accel = array("d", _per_axis(max_accel))   # degrees/s²
+        self.max_jerk = array("d", _per_axis(max_jerk))     # degrees/s³ (jerk mode)
+        self.deadzone = deadzone                            # degrees
+        self._seed = seed    # callable returning joints, used if step() runs before reset()
+
+        self._pos = array("d", bytes(8 * N_AXES))
+        self._vel = array("d", bytes(8 * N_AXES))
+        self._acc = array("d", bytes(8 * N_AXES))
+        self._seeded = False
+        self._last_time: float | None = None
+
+        self.mode = "accel"
+        self.set_mode(mode)
+
+    def set_limits(self, max_speed=None, max_accel=None, max_jerk=None):
+        if max_speed is not None:
+            self.max_speed[:] = array("d", _per_axis(max_speed))
+        if max_accel is not None:
+            self.max_accel[:] = array("d", _per_axis(max_accel))
+        if max_jerk is not None:
+            self.max_jerk[:] = array("d", _per_axis(max_jerk))
+
+    def set_mode(self, mode: str):
+        """Switch between "accel" and "jerk". Takes effect on the next step()."""
+        if mode not in SERVO_MODES:
+            raise ValueError(f"Unknown servo filter mode {mode!r}, expected one of {SERVO_MODES}")
+        if mode != self.mode:
+            # accel mode keeps no acceleration state; start the S-curve from zero
+            self._acc[:] = array("d", bytes(8 * N_AXES))
+        self.mode = mode
+
+    def load_preset(self, path: str):
+        """Apply servoSpeed / servoAcceleration (and servoJerk if present) from a preset JSON."""
+        with open(path) as f:
+            preset = json.load(f)
+        self.set_limits(max_speed=preset.get("servoSpeed"),
+                        max_accel=preset.get("servoAcceleration"),
+                        max_jerk=preset.get("servoJerk"))
+
+    def reset(self, position):
+        """Seed from the real robot position, at rest."""
+        self._pos[:] = array("d", position[:N_AXES])
+        self._vel[:] = array("d", bytes(8 * N_AXES))
+        self._acc[:] = array("d", bytes(8 * N_AXES))
+        self._seeded = True
+        self._last_time = time.perf_counter()
+
+    def halt(self):
+        """Come to rest at the last filtered position (after a drain or an idle spell)."""
+        self._vel[:] = array("d", bytes(8 * N_AXES))
+        self._acc[:] = array("d", bytes(8 * N_AXES))
+        self._last_time = time.perf_counter()
+
+    @property
+    def position(self) -> list[float]:
+        return self._pos.tolist()
+
+    def step(self, target, dt: float | None = None) -> list[float]:
+        """Advance all axes towards target by dt seconds. Returns the new positions."""
+        now = time.perf_counter()
+        if not self._seeded:
+            self.reset(self._seed() if self._seed else target)
+            return self._pos.tolist()
+
+        if dt is None:
+            dt = now - self._last_time
+        self._last_time = now
+
+        if dt <= 0:
+            dt = 1e-4
+
+        # Large gap (idle scheduler, pause): the robot has been holding the
+        # last commanded position, so restart from there at rest. Never jump
+        # to the target — it may be far away.
+        if dt > 0.5:
+            self._vel[:] = array("d", bytes(8 * N_AXES))
+            self._acc[:] = array("d", bytes(8 * N_AXES))
+            return self._pos.tolist()
+
+        if self.mode == "jerk":
+            self._step_jerk(target, dt)
+        else:
+            self._step_accel(target, dt)
+        return self._pos.tolist()
+
+    def _step_accel(self, target, dt: float):
+        pos = self._pos
+        vel = self._vel
+        deadzone = self.deadzone
+        for i, (p, v, t, a_max, v_lim) in enumerate(
+                zip(pos, vel, target, self.max_accel, self.max_speed)):
+            dist = t - p
+
+            # Snap when close enough
+            if -deadzone <= dist <= deadzone:
+                pos[i] = t
+                vel[i] = 0.0
+                continue
+
+            # Max safe velocity that allows stopping exactly at target
+            v_stop = math.sqrt(2.0 * a_max * abs(dist))
+            if dist < 0:
+                v_stop = -v_stop
+
+            # Acceleration-limited velocity step, then speed clamp
+            max_dv = a_max * dt
+            dv = v_stop - v
+            if dv > max_dv:
+                dv = max_dv
+            elif dv < -max_dv:
+                dv = -max_dv
+            v += dv
+            if v > v_lim:
+                v = v_lim
+            elif v < -v_lim:
+                v = -v_lim
+
+            pos[i] = p + v * dt
+            vel[i] = v
+
+    def _step_jerk(self, target, dt: float):
+        pos = self._pos
+        vel = self._vel
+        acc = self._acc
+        deadzone = self.deadzone
+        for i, (p, v, a, t, j_max, a_max, v_lim) in enumerate(
+                zip(pos, vel, acc, target, self.max_jerk, self.max_accel, self.max_speed)):
+            dist = t - p
+
+            # Snap only once the axis has (almost) stopped, otherwise the
+            # velocity step would be the very kick jerk mode is meant to avoid
+            if (-deadzone <= dist <= deadzone and -a_max * dt <= v <= a_max * dt
+                    and -j_max * dt <= a <= j_max * dt):
+                pos[i] = t
+                vel[i] = 0.0
+                acc[i] = 0.0
+                continue
+
+            # Work in the direction of the target: d > 0, v/a > 0 mean "towards"
+            s = 1.0 if dist >= 0 else -1.0
+            d = dist * s
+            v *= s
+            a *= s
+            da = j_max * dt
+
+            # Try, in order: ramp acceleration up, hold it, ramp it down.
+            # Take the first one after which a full jerk-limited stop still
+            # ends before the target (and speed stays within v_lim).
+            new_a = a - da if a - da > -a_max else -a_max
+            for a_try in (a + da if a + da < a_max else a_max,
+                          a if -a_max <= a <= a_max else math.copysign(a_max, a)):
+                v_try = v + a_try * dt
+                if v_try > v_lim or (a_try > 0 and v_try + a_try * a_try / (2.0 * j_max) > v_lim):
+                    continue
+                if _stop_distance(v_try, a_try, a_max, j_max) <= d - v_try * dt:
+                    new_a = a_try
+                    break
+
+            if -1e-9 < new_a < 1e-9 and -1e-9 < v < 1e-9:
+                # At rest but too close for even one jerk step to stop in
+                # time: creep the remainder in deadzone-sized steps
+                creep = j_max * dt * dt * dt
+                if creep < deadzone:
+                    creep = deadzone
+                pos[i] = p + (d if d < creep else creep) * s
+                vel[i] = 0.0
+                acc[i] = 0.0
+                continue
+
+            v += new_a * dt
+            if v > v_lim:
+                v = v_lim
+            elif v < -v_lim:
+                v = -v_lim
+
+            pos[i] = p + v * s * dt
+            vel[i] = v * s
+            acc[i] = new_a * s
+
+
+def _stop_distance(v: float, a: float, a_max: float, j_max: float) -> float:
+    """
+    Distance covered while braking to v = 0, a = 0 under jerk/accel limits.
+
+    Ramp acceleration down at -j_max to a peak (capped at -a_max), hold it,
+    then ramp back up to zero exactly as velocity reaches zero.
+    """
+    k = v * j_max + 0.5 * a * a
+    if k <= 0.0:
+        # Already slowing enough: only the ramp of a back to zero remains
+        if a <= 0.0:
+            return 0.0
+        t = a / j_max
+        return v * t + 0.5 * a * t * t - j_max * t * t * t / 6.0
+
+    a_peak = -math.sqrt(k)
+    if a_peak < -a_max:
+        a_peak = -a_max
+
+    t1 = (a - a_peak) / j_max
+    s1 = v * t1 + 0.5 * a * t1 * t1 - j_max * t1 * t1 * t1 / 6.0
+    v1 = v + (a * a - a_peak * a_peak) / (2.0 * j_max)
+
+    t2 = (v1 - a_peak * a_peak / (2.0 * j_max)) / a_max if a_peak <= -a_max else 0.0
+    if t2 < 0.0:
+        t2 = 0.0
+    s2 = v1 * t2 + 0.5 * a_peak * t2 * t2
+    v2 = v1 + a_peak * t2
+
+    t3 = -a_peak / j_max
+    s3 = v2 * t3 + 0.5 * a_peak * t3 * t3 + j_max * t3 * t3 * t3 / 6.0
+    return s1 + s2 + s3
+
+
+def _per_axis(value) -> list[float]:
+    """Scalar → 6 values, (j1-3, j4-6) pair → 6 values, 6 values → as is."""
+    if isinstance(value, (int, float)):
+        return [float(value)] * N_AXES
+    values = [float(v) for v in value]
+    if len(values) == 2:
+        return [values[0]] * 3 + [values[1]] * 3
+    if len(values) == N_AXES:
+        return values
+    raise ValueError(f"Expected 1, 2 or {N_AXES} limit values, got {len(values)}")
+
+
+# ---------------------------------------------------------------------------
+# ServoScheduler
+# ---------------------------------------------------------------------------
+
+class ServoScheduler:
+    """
+    Sends ServoJ at a fixed cmdT from its own thread.
+
+    OSC handlers only submit() targets into a TargetSlot. Every tick the
+    scheduler takes the newest target (or keeps the previous one), steps the
+    servo filter and issues exactly one ServoJ. Motion smoothness therefore
+    depends on cmdT, not on how evenly the sender's packets arrive, and a
+    burst of packets never turns into a burst of stale commands.
+
+    The filter is always stepped by cmdT, the time each ServoJ covers, not by
+    wall-clock time, so a late tick never turns into a bigger jump. The first
+    target after start() or drain() moves off from rest.
+
+    A producer that must land exactly one value per ServoJ (playback) can
+    set_source(pull) instead: the tick then calls pull() for its target,
+    so the two never drift apart the way two separate 8 ms clocks do.
+
+    Usage
+    -----
+    scheduler = ServoScheduler(robot, step=servo_filter.step, halt=servo_filter.halt, cmd_t=0.008)
+    scheduler.start()          # after robot.ServoMoveStart()
+    scheduler.submit(target_q) # from /servoj, any rate
+    scheduler.set_source(pull) # or: pull() -> target (None = hold) once per tick
+    scheduler.drain()          # emergency: stop sending at once
+    scheduler.stop()           # before robot.ServoMoveEnd()
+    """
+
+    def __init__(self, robot, step, cmd_t: float = 0.008, halt=None):
+        self._robot = robot
+        self._step = step          # step(target_q, dt) -> filtered_q
+        self._halt = halt          # halt(): filter at rest, called before the first target
+        self.cmd_t = cmd_t
+
+        self._slot = TargetSlot()
+        self._source = None        # source() -> target or None, replaces the slot while set
+        self._target = None
+        self._active = threading.Event()
+        self._tick_lock = threading.Lock()
+        self._thread: threading.Thread | None = None
+
+        self._drains = 0    # bumped by drain(), checked by the tick in flight
+
+        self.ticks = 0
+        self.errors = 0
+
+    @property
+    def is_active(self) -> bool:
+        return self._active.is_set()
+
+    def start(self):
+        """Begin streaming. Targets submitted before start() are discarded."""
+        self._slot.clear()
+        self._target = None
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, daemon=True)
+            self._thread.start()
+        self._active.set()
+
+    def stop(self, wait: bool = True):
+        """
+        Stop streaming. With wait=True, returns once any in-flight ServoJ has
+        completed; with wait=False it returns at once (the tick in flight
+        finishes on its own, nothing is sent after it).
+        """
+        self._active.clear()
+        if not wait:
+            self.drain()
+            return
+        with self._tick_lock:
+            self._source = None
+            self._slot.clear()
+            self._target = None
+
+    def drain(self):
+        """
+        Drop the pending and current target without waiting for the tick in
+        flight. Until a new target is submitted no further ServoJ is sent.
+        """
+        self._drains += 1
+        self._source = None
+        self._slot.clear()
+        self._target = None
+
+    def submit(self, target_q: list[float]):
+        self._slot.put(target_q)
+
+    def set_source(self, source):
+        """
+        Pull targets instead of taking submitted ones: source() is called once
+        per tick from the scheduler thread and must return quickly; None holds
+        the previous target. set_source(None) goes back to submit().
+        drain() and stop() remove the source.
+        """
+        self._source = source
+
+    @property
+    def superseded(self) -> int:
+        """Targets replaced by a newer one before a tick picked them up."""
+        return self._slot.superseded
+
+    # ------------------------------------------------------------------
+    # Scheduler thread
+    # ------------------------------------------------------------------
+
+    def _run(self):
+        while True:
+            self._active.wait()
+            next_t = time.perf_counter()
+
+            while self._active.is_set():
+                next_t += self.cmd_t
+                sleep_t = next_t - time.perf_counter()
+                if sleep_t > 0:
+                    time.sleep(sleep_t)
+                else:
+                    # Fell behind (slow RPC): drop the missed ticks, don't burst
+                    next_t = time.perf_counter()
+
+                with self._tick_lock:
+                    if not self._active.is_set():
+                        break
+                    self._tick()
+
+    def _tick(self):
+        drains = self._drains
+        source = self._source
+        if source is None:
+            target = self._slot.take()
+        else:
+            try:
+                target = source()
+            except Exception:
+                self.errors += 1
+                target = None
+        if target is not None:
+            if self._target is None and self._halt is not None:
+                # First target since start() / drain(): don't carry the old velocity
+                self._halt()
+            self._target = target
+        if self._target is None:
+            return
+        if drains != self._drains:
+            # drain() ran since we looked at the slot: don't resurrect its target
+            self._target = None
+            return
+
+        try:
+            filtered_q = self._step(self._target, self.cmd_t)
+            self._robot.ServoJ(joint_pos=filtered_q, axisPos=[0.0, 0.0, 0.0, 0.0],
+                               cmdT=self.cmd_t, acc=50, vel=50)
+            self.ticks += 1
+        except Exception:
+            self.errors += 1
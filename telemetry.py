@@ -0,0 +1,494 @@
+import struct
+import threading
+import time
+from typing import NamedTuple
+
+
+# ---------------------------------------------------------------------------
+# Packet layout (port 8083 high-speed stream)
+# ---------------------------------------------------------------------------
+#
+#   offset 0  uint16  0x5A5A header
+#   offset 2  uint8   frame counter
+#   offset 3  uint16  data length (little endian)
+#   offset 5  ...     data
+#   last 2    uint16  checksum
+
+FRAME_HEADER = b"\x5a\x5a"
+HEADER_SIZE = 5
+CHECKSUM_SIZE = 2
+
+_DATA_LEN = struct.Struct("<H")
+
+
+class TelemetryField(NamedTuple):
+    name: str
+    offset: int   # byte offset from the start of the packet
+    code: str     # struct format code
+    count: int    # 1 → scalar, >1 → tuple
+
+
+# Fields we use from each 8083 packet
+TELEMETRY_FIELDS = (
+    TelemetryField("frame_cnt",  2,   "B", 1),
+    TelemetryField("base_error", 6,   "B", 1),
+    TelemetryField("robot_mode", 7,   "B", 1),
+    TelemetryField("joints",     8,   "d", 6),   # jt_cur_pos
+    TelemetryField("tcp_pose",   56,  "d", 6),   # 8 meta + 48 joints
+    TelemetryField("torques",    108, "d", 6),   # skips toolNum int4
+    TelemetryField("ft_sensor",  184, "d", 6),   # serial 32 in manual
+    TelemetryField("main_err",   314, "i", 1),   # serial 67
+    TelemetryField("sub_err",    318, "i", 1),   # serial 68
+)
+
+
+# ---------------------------------------------------------------------------
+# PacketFramer
+# ---------------------------------------------------------------------------
+
+class PacketFramer:
+    """
+    Splits a TCP byte stream into 0x5A5A-framed packets without copying.
+
+    Incoming data is received straight into a preallocated bytearray with
+    sock.recv_into(). Complete packets are handed out as memoryview slices
+    of that buffer, so a burst of queued packets is drained in a single pass.
+    Only the trailing partial packet is ever moved, and only when the free
+    space at the end of the buffer runs low.
+
+    With verify=True, packets whose checksum does not match are dropped and
+    counted in `corrupt`. Gaps in the frame counter are counted in `dropped`.
+
+    Usage
+    -----
+    framer = PacketFramer()
+    while framer.fill(sock):
+        for packet in framer.packets():
+            ...   # decode immediately — the view is reused on the next fill()
+    """
+
+    def __init__(self, capacity: int = 1 << 17, verify: bool = True):
+        # A packet can be at most 5 + 0xFFFF + 2 bytes, so the default
+        # capacity always fits a whole packet plus the next partial one.
+        self._buf = bytearray(capacity)
+        self._view = memoryview(self._buf)
+        self._start = 0   # first unparsed byte
+        self._end = 0     # one past the last received byte
+
+        self.verify = verify
+        self.packets_ok = 0
+        self.corrupt = 0
+        self.dropped = 0
+        self._last_cnt: int | None = None
+        self._corrupt_since_ok = 0
+
+    def fill(self, sock) -> int:
+        """
+        Receive whatever the socket has into the free space of the buffer.
+        Returns the number of bytes received; 0 means the peer closed.
+        """
+        if self._start == self._end:
+            self._start = self._end = 0
+        elif len(self._buf) - self._end < 4096:
+            self._compact()
+        n = sock.recv_into(self._view[self._end:])
+        self._end += n
+        return n
+
+    def packets(self):
+        """Yield every complete packet currently in the buffer as a memoryview."""
+        buf = self._buf
+        view = self._view
+        while self._end - self._start >= HEADER_SIZE:
+            header_idx = buf.find(FRAME_HEADER, self._start, self._end)
+
+            if header_idx == -1:
+                # No header — keep the last byte in case it is half of one
+                self._start = self._end - 1
+                return
+
+            self._start = header_idx
+            if self._end - header_idx < HEADER_SIZE:
+                return
+
+            data_len = _DATA_LEN.unpack_from(buf, header_idx + 3)[0]
+            total = HEADER_SIZE + data_len + CHECKSUM_SIZE
+            if self._end - header_idx < total:
+                return
+
+            if self.verify:
+                body_end = header_idx + HEADER_SIZE + data_len
+                checksum = _DATA_LEN.unpack_from(buf, body_end)[0]
+                if sum(view[header_idx:body_end]) & 0xFFFF != checksum:
+                    # Length may be garbage too — resync one byte on, so a
+                    # stray 0x5A right before a real header doesn't hide it
+                    self.corrupt += 1
+                    self._corrupt_since_ok += 1
+                    self._start = header_idx + 1
+                    continue
+
+            # Frames missing from the counter, minus the ones we discarded as corrupt
+            cnt = buf[header_idx + 2]
+            if self._last_cnt is not None:
+                gap = (cnt - self._last_cnt - 1) & 0xFF
+                self.dropped += max(0, gap - self._corrupt_since_ok)
+            self._last_cnt = cnt
+            self._corrupt_since_ok = 0
+            self.packets_ok += 1
+
+            self._start = header_idx + total
+            yield view[header_idx:header_idx + total]
+
+    def _compact(self):
+        """Move the unparsed tail to the front of the buffer."""
+        pending = self._end - self._start
+        self._buf[:pending] = self._view[self._start:self._end].tobytes()
+        self._start = 0
+        self._end = pending
+
+
+# ---------------------------------------------------------------------------
+# TelemetryDecoder
+# ---------------------------------------------------------------------------
+
+class TelemetryDecoder:
+    """
+    Decodes a telemetry packet into a record with one precompiled struct.
+
+    The field table is turned into a single struct.Struct (gaps become pad
+    bytes), so decoding a packet is one unpack_from() call. Records use
+    __slots__ and hold tuples for multi-value fields.
+
+    The same table drives pack(), which synthesizes a valid packet — handy
+    for test stand-ins that pretend to be the robot.
+
+    Usage
+    -----
+    decoder = TelemetryDecoder()
+    frame = decoder.decode(packet)
+    frame.joints, frame.tcp_pose, frame.main_err, ...
+    """
+
+    def __init__(self, fields=TELEMETRY_FIELDS):
+        fields = sorted(fields, key=lambda f: f.offset)
+
+        fmt = "<"
+        pos = 0
+        self._layout = []   # (name, start, stop) into the unpacked tuple; stop None → scalar
+        n_values = 0
+        for field in fields:
+            if field.offset < pos:
+                raise ValueError(f"Telemetry field '{field.name}' overlaps the previous field")
+            if field.offset > pos:
+                fmt += f"{field.offset - pos}x"
+            fmt += f"{field.count}{field.code}"
+            pos = field.offset + struct.calcsize(f"<{field.count}{field.code}")
+
+            if field.count == 1:
+                self._layout.append((field.name, n_values, None))
+            else:
+                self._layout.append((field.name, n_values, n_values + field.count))
+            n_values += field.count
+
+        self.fields = tuple(fields)
+        self._struct = struct.Struct(fmt)
+        self.record_type = _make_record_type([f.name for f in fields])
+
+    @property
+    def size(self) -> int:
+        """Minimum packet size (header included) this decoder can read."""
+        return self._struct.size
+
+    def decode(self, packet, stamp: float = 0.0):
+        """
+        Decode a packet (bytes or memoryview). Returns None if it is too short.
+        stamp is stored on the record as its receive time (time.time() seconds).
+        """
+        if len(packet) < self._struct.size:
+            return None
+        values = self._struct.unpack_from(packet)
+        record = self.record_type()
+        record.stamp = stamp
+        for name, start, stop in self._layout:
+            if stop is None:
+                setattr(record, name, values[start])
+            else:
+                setattr(record, name, values[start:stop])
+        return record
+
+    def pack(self, **values) -> bytes:
+        """
+        Build a complete framed packet from field values.
+        Missing fields are zero; header, data length and checksum are filled in.
+        """
+        flat = []
+        for field in self.fields:
+            value = values.get(field.name, 0)
+            if field.count == 1:
+                flat.append(value)
+            else:
+                value = value or (0,) * field.count
+                flat.extend(value)
+
+        data_len = self._struct.size - HEADER_SIZE
+        packet = bytearray(self._struct.size + CHECKSUM_SIZE)
+        self._struct.pack_into(packet, 0, *flat)
+        packet[0:2] = FRAME_HEADER
+        _DATA_LEN.pack_into(packet, 3, data_len)
+        _DATA_LEN.pack_into(packet, HEADER_SIZE + data_len, sum(packet[:HEADER_SIZE + data_len]) & 0xFFFF)
+        return bytes(packet)
+
+
+def _make_record_type(names):
+    def __repr__(self):
+        body = ", ".join(f"{n}={getattr(self, n, None)!r}" for n in names)
+        return f"TelemetryFrame({body})"
+
+    return type("TelemetryFrame", (), {"__slots__": (*names, "stamp"), "__repr__": __repr__})
+
+
+# ---------------------------------------------------------------------------
+# SDK state packets (port 20004)
+# ---------------------------------------------------------------------------
+
+_STATE_FRAME = _make_record_type([f.name for f in TELEMETRY_FIELDS])
+
+
+def frame_from_state_pkg(pkg, stamp: float = 0.0):
+    """
+    Build a telemetry record from an SDK RobotStatePkg, so the 20004 stream
+    the SDK already decodes can feed the same consumers as 8083 packets.
+    The 20004 packet has no base error byte; base_error is always 0.
+    """
+    record = _STATE_FRAME()
+    record.stamp = stamp
+    record.frame_cnt = pkg.frame_cnt
+    record.base_error = 0
+    record.robot_mode = pkg.robot_mode
+    record.joints = tuple(pkg.jt_cur_pos)
+    record.tcp_pose = tuple(pkg.tl_cur_pos)
+    record.torques = tuple(pkg.jt_cur_tor)
+    record.ft_sensor = tuple(pkg.ft_sensor_data)
+    record.main_err = pkg.main_code
+    record.sub_err = pkg.sub_code
+    return record
+
+
+# ---------------------------------------------------------------------------
+# TelemetryPublisher
+# ---------------------------------------------------------------------------
+
+class TelemetryPublisher:
+    """
+    Broadcasts telemetry over OSC at its own fixed rate.
+
+    The telemetry loop submit()s every decoded frame; this class keeps only
+    the newest one and a background thread sends it once per interval.
+    Ingest rate (whatever the robot streams) and output rate (/telemetry/hz)
+    are therefore independent. A frame is never sent twice, so asking for a
+    rate above the stream rate simply sends every frame.
+
+    Addresses listed in `deadband` are only sent when a value moved by more
+    than their epsilon since the last send (0 → any change), or when
+    `keepalive` seconds have passed so late-joining clients still get state.
+
+    Usage
+    -----
+    publisher = TelemetryPublisher(osc_client, hz=125.0)
+    publisher.start()
+
+    # In your telemetry loop:
+    publisher.submit(frame)
+
+    # Via OSC:
+    publisher.set_rate(30.0)
+    publisher.bundle = True   # one OSC bundle per frame instead of six messages
+    publisher.set_deadband("/j_pos", 0.01)
+    """
+
+    def __init__(self, osc_client, hz: float = 125.0, bundle: bool = False,
+                 deadband: dict | None = None, keepalive: float = 1.0):
+        self._client = osc_client
+        self.interval = 1.0 / hz
+        self.bundle = bundle
+
+        self.deadband = dict(deadband or {})   # address → epsilon
+        self.keepalive = keepalive
+        self._last_values: dict = {}   # address → values last sent
+        self._last_sent: dict = {}     # address → perf_counter of last send
+
+        self._latest = None
+        self._latest_seq = 0
+        self._sent_seq = 0
+
+        self._rate_changed = threading.Event()
+        self._thread: threading.Thread | None = None
+
+    def set_rate(self, hz: float) -> float:
+        """Change the broadcast rate. Returns the rate actually applied."""
+        # Ensure we don't divide by zero or go too fast
+        safe_hz = max(0.1, min(float(hz), 1000.0))
+        self.interval = 1.0 / safe_hz
+        self._rate_changed.set()
+        return safe_hz
+
+    def set_deadband(self, address: str, epsilon: float | None):
+        """Set the change threshold for one address. None sends it every frame again."""
+        if epsilon is None or epsilon < 0:
+            self.deadband.pop(address, None)
+        else:
+            self.deadband[address] = float(epsilon)
+        self._last_values.pop(address, None)
+
+    def submit(self, frame):
+        """Hand over the newest frame. Called from the telemetry thread only."""
+        self._latest = frame
+        self._latest_seq += 1
+
+    def start(self):
+        if self._thread is not None:
+            return
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    # ------------------------------------------------------------------
+    # Publisher thread
+    # ------------------------------------------------------------------
+
+    def _run(self):
+        next_t = time.perf_counter()
+        while True:
+            next_t += self.interval
+            sleep_t = next_t - time.perf_counter()
+            if sleep_t > 0:
+                if self._rate_changed.wait(sleep_t):
+                    # New rate — restart the schedule from now
+                    self._rate_changed.clear()
+                    next_t = time.perf_counter()
+                    continue
+            else:
+                # Fell behind: skip the missed slots instead of bursting
+                next_t = time.perf_counter()
+
+            seq = self._latest_seq
+            if seq == self._sent_seq:
+                continue
+            frame = self._latest
+            self._sent_seq = seq
+
+            try:
+                self._send(frame)
+            except Exception as e:
+                print(f"Telemetry Publish Error: {e}")
+
+    def _send(self, frame):
+        due = self._due_channels(frame)
+        if not due:
+            return
+        if self.bundle:
+            self._send_bundle(frame, due)
+        else:
+            self._send_messages(due)
+
+    def _due_channels(self, frame) -> list:
+        """Channels that changed beyond their deadband or are due a keep-alive."""
+        now = time.perf_counter()
+        due = []
+        for channel, values in _channel_values(frame):
+            address = channel.address
+            epsilon = self.deadband.get(address)
+            if epsilon is not None:
+                last = self._last_values.get(address)
+                if (last is not None
+                        and now - self._last_sent[address] < self.keepalive
+                        and not _moved(values, last, epsilon)):
+                    continue
+                self._last_values[address] = values
+                self._last_sent[address] = now
+            due.append((channel, values))
+        return due
+
+    def _send_messages(self, due):
+        client = self._client
+        for channel, values in due:
+            client.send_message(channel.address, list(values))
+
+    def _send_bundle(self, frame, due):
+        """All due channels in one datagram, timetagged with the frame's receive time."""
+        elements = [channel.pack(values) for channel, values in due]
+        dgram = _BUNDLE_HEAD.pack(b"#bundle", _ntp_timetag(frame.stamp)) + b"".join(elements)
+        self._client.send(_Datagram(dgram))
+
+
+# ---------------------------------------------------------------------------
+# OSC encoding helpers
+# ---------------------------------------------------------------------------
+
+def _osc_string(value: str) -> bytes:
+    data = value.encode() + b"\0"
+    return data + b"\0" * (-len(data) % 4)
+
+
+def _ntp_timetag(stamp: float) -> int:
+    if not stamp:
+        return 1   # OSC "immediately"
+    seconds = stamp + _NTP_EPOCH_OFFSET
+    whole = int(seconds)
+    return (whole << 32) | int((seconds - whole) * (1 << 32))
+
+
+class _OscChannel:
+    """
+    Prebuilt encoder for one OSC address as a bundle element.
+    Address and type tags are encoded once; pack() only writes the payload.
+    """
+
+    def __init__(self, address: str, type_tags: str):
+        self.address = address
+        prefix = _osc_string(address) + _osc_string("," + type_tags)
+        payload = struct.calcsize(">" + type_tags)
+        self._size = len(prefix) + payload
+        self._prefix = prefix
+        self._struct = struct.Struct(f">i{len(prefix)}s{type_tags}")
+
+    def pack(self, values) -> bytes:
+        return self._struct.pack(self._size, self._prefix, *values)
+
+
+class _Datagram:
+    """Minimal stand-in for python-osc's OscMessage/OscBundle; UDPClient.send only reads .dgram."""
+    __slots__ = ("dgram",)
+
+    def __init__(self, dgram: bytes):
+        self.dgram = dgram
+
+
+_J_POS      = _OscChannel("/j_pos",      "ffffff")
+_TCP_POS    = _OscChannel("/tcp_pos",    "ffffff")
+_J_TORQ     = _OscChannel("/j_torq",     "ffffff")
+_FT_SENS    = _OscChannel("/ft_sens",    "ffffff")
+_ROBOT_MODE = _OscChannel("/robot_mode", "i")
+_ERROR      = _OscChannel("/error",      "iii")
+
+_BUNDLE_HEAD = struct.Struct(">8sQ")
+_NTP_EPOCH_OFFSET = 2208988800   # seconds between 1900-01-01 and 1970-01-01
+
+
+def _moved(values, last, epsilon: float) -> bool:
+    if epsilon == 0:
+        return values != last
+    for a, b in zip(values, last):
+        if abs(a - b) > epsilon:
+            return True
+    return False
+
+
+def _channel_values(frame):
+    return (
+        (_J_POS,      frame.joints),
+        (_TCP_POS,    frame.tcp_pose),
+        (_J_TORQ,     frame.torques),
+        (_FT_SENS,    frame.ft_sensor),
+        (_ROBOT_MODE, (frame.robot_mode,)),
+        (_ERROR,      (frame.base_error, frame.main_err, frame.sub_err)),
+    )
@@ -0,0 +1,74 @@
+import csv
+import glob
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from servo import ServoFilter
+
+# ---------------- CONFIG ----------------
+RECORDINGS = "ai_recordings/*.csv"
+
+CMD_T = 0.008                        # filter tick (s), same as SERVO_CMD_T
+MAX_SPEED = (140.0, 170.0)           # degrees/s  (j1-3, j4-6)
+MAX_ACCEL = 2500.0                   # degrees/s²
+MAX_JERK = (30000.0, 50000.0)        # degrees/s³  (j1-3, j4-6), jerk mode only
+MODE = "accel"                       # "accel" or "jerk"
+# ----------------------------------------
+
+# Offline run of the servo filter over recorded takes, no robot needed.
+# Targets are sample-and-hold from the recording at each CMD_T tick, like
+# the servo thread sees them. Reports cost per step and how far the
+# filtered output lags the recording.
+
+files = sorted(glob.glob(RECORDINGS))
+if not files:
+    print(f"No recordings match {RECORDINGS}")
+    sys.exit(1)
+
+total_steps = 0
+total_time = 0.0
+
+print(f"{'file':40s} {'steps':>7s} {'us/step':>8s} {'max err':>8s} {'mean err':>9s}")
+
+for path in files:
+    with open(path, newline="") as f:
+        rows = list(csv.DictReader(f))
+    if not rows:
+        continue
+    t = [float(r["t"]) for r in rows]
+    joints = [[float(r[f"j{i}"]) for i in range(1, 7)] for r in rows]
+
+    filt = ServoFilter(max_speed=MAX_SPEED, max_accel=MAX_ACCEL, max_jerk=MAX_JERK, mode=MODE)
+    filt.reset(joints[0])
+
+    # Build the tick-aligned target sequence first so only step() is timed
+    targets = []
+    idx = 0
+    tick_t = t[0]
+    while tick_t <= t[-1]:
+        while idx + 1 < len(t) and t[idx + 1] <= tick_t:
+            idx += 1
+        targets.append(joints[idx])
+        tick_t += CMD_T
+
+    outputs = []
+    start = time.perf_counter()
+    for target in targets:
+        outputs.append(filt.step(target, CMD_T))
+    elapsed = time.perf_counter() - start
+
+    errors = [max(abs(a - b) for a, b in zip(out, tgt)) for out, tgt in zip(outputs, targets)]
+    max_err = max(errors)
+    mean_err = sum(errors) / len(errors)
+
+    total_steps += len(targets)
+    total_time += elapsed
+    print(f"{os.path.basename(path):40s} {len(targets):7d} {elapsed / len(targets) * 1e6:8.2f}"
+          f" {max_err:8.3f} {mean_err:9.3f}")
+
+print(f"\n--- Total ---\n"
+      f"Steps: {total_steps}\n"
+      f"Average step cost: {total_time / total_steps * 1e6:.2f} us\n"
+      f"Budget used at {1 / CMD_T:.0f} Hz: {total_time / total_steps / CMD_T * 100:.3f} %")
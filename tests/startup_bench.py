@@ -0,0 +1,114 @@
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+
+# ---------------- CONFIG ----------------
+ROBOT_IP = "192.168.57.2"
+
+RUNS = 5                 # fresh interpreters per measurement
+TOP_IMPORTS = 8          # slowest imports to list from -X importtime
+READY_TIMEOUT = 5.0      # seconds to wait for the robot before giving up
+# ----------------------------------------
+
+# Cold-start cost of the bridge, each step in a fresh interpreter:
+#   1. import fairino.Robot with its .pyc (normal restart)
+#   2. import fairino.Robot without a .pyc (first run after an SDK change)
+#   3. import the bridge's own modules (OSC, servo, telemetry, recorder, player)
+#   4. RPC(lazy=True) construction, time until ready, first command round trip
+# Steps 1-3 need no robot. Step 4 reports "not reachable" without one.
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+IMPORT_SDK = """
+import time
+t = time.perf_counter()
+from fairino import Robot
+print((time.perf_counter() - t) * 1000)
+"""
+
+IMPORT_BRIDGE = """
+import time
+t = time.perf_counter()
+from pythonosc import dispatcher, udp_client
+from pythonosc.osc_server import ThreadingOSCUDPServer
+import recorder, player, servo, telemetry
+print((time.perf_counter() - t) * 1000)
+"""
+
+CONNECT = f"""
+import time
+from fairino import Robot
+t0 = time.perf_counter()
+robot = Robot.RPC({ROBOT_IP!r}, lazy=True)
+t1 = time.perf_counter()
+ready = robot.wait_ready({READY_TIMEOUT})
+t2 = time.perf_counter()
+first = float("nan")
+if ready:
+    robot.GetActualJointPosDegree()
+    first = (time.perf_counter() - t2) * 1000
+print((t1 - t0) * 1000, (t2 - t1) * 1000 if ready else float("nan"), first)
+"""
+
+
+def run(code, env=None, args=(), cwd=REPO_ROOT):
+    out = subprocess.run([sys.executable, *args, "-c", code], cwd=cwd, env=env,
+                         capture_output=True, text=True)
+    return out
+
+
+def last_floats(out):
+    return [float(x) for x in out.stdout.strip().splitlines()[-1].split()]
+
+
+def report(name, samples):
+    samples = sorted(samples)
+    print(f"{name:36s} min {samples[0]:8.1f} ms   median {samples[len(samples) // 2]:8.1f} ms")
+
+
+# 1. Warm .pyc
+run(IMPORT_SDK)   # make sure the .pyc exists
+report("import fairino.Robot (.pyc)", [last_floats(run(IMPORT_SDK))[0] for _ in range(RUNS)])
+
+# 2. No .pyc for the SDK only: import a fresh copy of Robot.py with -B
+samples = []
+for _ in range(RUNS):
+    with tempfile.TemporaryDirectory() as tmp:
+        os.mkdir(os.path.join(tmp, "fairino"))
+        shutil.copy(os.path.join(REPO_ROOT, "fairino", "Robot.py"), os.path.join(tmp, "fairino"))
+        env = dict(os.environ, PYTHONPATH=tmp)
+        samples.append(last_floats(run(IMPORT_SDK, env=env, args=("-B",), cwd=tmp))[0])
+report("import fairino.Robot (no .pyc)", samples)
+
+# 3. Bridge modules
+run(IMPORT_BRIDGE)
+report("import bridge modules", [last_floats(run(IMPORT_BRIDGE))[0] for _ in range(RUNS)])
+
+# Slowest imports behind fairino.Robot
+out = run("from fairino import Robot", args=("-X", "importtime"))
+rows = []
+for line in out.stderr.splitlines():
+    parts = line.split("|")
+    if len(parts) == 3 and parts[1].strip().isdigit():
+        rows.append((int(parts[1]), parts[2].rstrip()))
+print("\nSlowest imports (cumulative) behind fairino.Robot:")
+for cumulative, module in sorted(rows, reverse=True)[:TOP_IMPORTS]:
+    print(f"  {cumulative / 1000:8.1f} ms  {module.strip()}")
+
+# 4. Connection
+print(f"\nConnecting to {ROBOT_IP} ...")
+out = run(CONNECT)
+try:
+    construct, ready, first = last_floats(out)
+except (ValueError, IndexError):
+    print(out.stdout + out.stderr)
+    sys.exit(1)
+
+print(f"RPC(lazy=True) returns after       {construct:8.1f} ms")
+if ready == ready:   # not NaN
+    print(f"Ready after                        {ready:8.1f} ms")
+    print(f"First command round trip           {first:8.1f} ms")
+else:
+    print(f"Robot not reachable within {READY_TIMEOUT} s")